@@ -50,6 +50,8 @@ def get_pyinstaller_base_args():
         '--hidden-import=pyautogui',
         '--hidden-import=win32com.client',
         '--hidden-import=emoji',  # 保留 emoji
+        '--hidden-import=soundfile',  # FLAC/Opus 编码
+        '--collect-data=_soundfile_data',
         # 排除不需要的模块
         '--exclude-module=matplotlib',
         '--exclude-module=scipy',
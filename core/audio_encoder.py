@@ -0,0 +1,111 @@
+import io
+import sys
+import time
+from .wav_utils import parse_wav
+from .logger import Logger
+
+try:
+    import soundfile as sf
+except (ImportError, OSError):  # 缺少soundfile或libsndfile时只能上传WAV
+    sf = None
+
+class AudioEncoder:
+    """上传前的音频编码阶段，支持WAV、FLAC(无损)和Opus/OGG(有损)"""
+
+    # 格式: (文件扩展名, MIME类型, soundfile格式, soundfile子类型)
+    FORMATS = {
+        "wav": ("wav", "audio/wav", None, None),
+        "flac": ("flac", "audio/flac", "FLAC", "PCM_16"),
+        "opus": ("ogg", "audio/ogg", "OGG", "OPUS")
+    }
+    OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+    def __init__(self, config_manager):
+        self.config = config_manager
+        self.logger = Logger(config_manager)
+        # 服务端拒绝过的(提供商, API地址, 格式)，本次运行中改用WAV；更换API地址后重新尝试
+        self._rejected = set()
+
+    def encode(self, audio_data, provider):
+        """按提供商设置编码WAV数据，返回(文件名, 音频数据, MIME类型)
+
+        编码器不可用、提供商不支持或编码失败时退回WAV
+        """
+        settings = self.config.config["api_settings"]["transcription"].get(provider, {})
+        audio_format = settings.get("audio_format", "wav")
+        if audio_format != "wav":
+            if (provider, settings.get("api_url"), audio_format) in self._rejected:
+                self.logger.debug(f"{provider} 不接受 {audio_format} 格式，使用WAV上传")
+            else:
+                try:
+                    start = time.process_time()
+                    encoded = self._encode(audio_data, audio_format)
+                    elapsed = time.process_time() - start
+                    self.logger.info(
+                        f"音频编码为{audio_format}: {len(audio_data)} -> {len(encoded)} 字节 "
+                        f"({len(audio_data) / max(len(encoded), 1):.1f}倍), CPU {elapsed * 1000:.1f}ms"
+                    )
+                    extension, mime = self.FORMATS[audio_format][:2]
+                    return f"audio.{extension}", encoded, mime
+                except Exception as e:
+                    self.logger.warning(f"{audio_format}编码失败，使用WAV上传: {str(e)}")
+        return self.wav_file(audio_data)
+
+    def wav_file(self, audio_data):
+        """不编码，直接以WAV上传"""
+        return "audio.wav", audio_data, "audio/wav"
+
+    def reject(self, provider):
+        """记录提供商不接受当前设置的上传格式，之后的上传改用WAV"""
+        settings = self.config.config["api_settings"]["transcription"].get(provider, {})
+        self._rejected.add((provider, settings.get("api_url"), settings.get("audio_format", "wav")))
+
+    def _encode(self, audio_data, audio_format):
+        """使用soundfile在内存中编码"""
+        if audio_format == "wav":
+            return audio_data
+        if sf is None:
+            raise Exception("未安装soundfile，无法编码")
+        pcm, sample_rate, channels = parse_wav(audio_data)
+        _, _, file_format, subtype = self.FORMATS[audio_format]
+        if audio_format == "opus" and sample_rate not in self.OPUS_RATES:
+            raise Exception(f"Opus不支持{sample_rate}Hz采样率")
+        byte_io = io.BytesIO()
+        with sf.SoundFile(byte_io, 'w', samplerate=sample_rate, channels=channels,
+                          format=file_format, subtype=subtype) as f:
+            f.write(pcm)
+        return byte_io.getvalue()
+
+    def benchmark(self, audio_data, repeat=5):
+        """对比各格式的编码CPU耗时与节省的字节数，返回结果列表"""
+        results = []
+        for audio_format in self.FORMATS:
+            try:
+                start = time.process_time()
+                for _ in range(repeat):
+                    encoded = self._encode(audio_data, audio_format)
+                elapsed = (time.process_time() - start) / repeat
+            except Exception as e:
+                results.append({"format": audio_format, "error": str(e)})
+                continue
+            results.append({
+                "format": audio_format,
+                "bytes": len(encoded),
+                "saved_bytes": len(audio_data) - len(encoded),
+                "ratio": len(audio_data) / max(len(encoded), 1),
+                "cpu_ms": elapsed * 1000
+            })
+        return results
+
+if __name__ == "__main__":
+    # 用法: python -m core.audio_encoder 录音.wav
+    from types import SimpleNamespace
+    with open(sys.argv[1], "rb") as f:
+        wav_data = f.read()
+    encoder = AudioEncoder(SimpleNamespace(config={"general_settings": {"enable_logging": False}}))
+    print(f"{'格式':<6}{'字节数':>12}{'压缩比':>8}{'CPU(ms)':>10}")
+    for result in encoder.benchmark(wav_data):
+        if "error" in result:
+            print(f"{result['format']:<6}  {result['error']}")
+        else:
+            print(f"{result['format']:<6}{result['bytes']:>12}{result['ratio']:>8.1f}{result['cpu_ms']:>10.1f}")
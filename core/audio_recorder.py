@@ -1,81 +1,318 @@
 import sounddevice as sd
 import numpy as np
-import wave
-import io
 import threading
 import time
+from .resampler import StreamingResampler
+from .wav_utils import build_wav_header
+from .level_queue import LevelQueue
+from .capture_health import CaptureHealth
+
+def float_to_int16(samples, out):
+    """float音频写入int16数组，先限制到[-1, 1]
+
+    重采样滤波器在响亮或削波的输入上会超出满幅，设备输入也可能大于1.0，
+    不限制的话unsafe转换会回绕成相反符号的爆音。
+    """
+    np.multiply(np.clip(samples, -1.0, 1.0), 32767, out=out, casting='unsafe')
+
+class RecordingReader:
+    """读取进行中录音的已写入部分，供边录边处理使用
+
+    录音只会在缓冲区末尾追加数据，已写入的部分不会再改变，
+    因此读取方无需加锁，直接返回缓冲区的内存视图。
+    """
+
+    def __init__(self, recorder, buffer, sample_rate, channels):
+        self._recorder = recorder
+        self._buffer = buffer
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.position = 0
+        self.end = None  # 录音结束后的最终样本数
+        self.finished = False
+        self.aborted = False
+
+    def available(self):
+        """当前已写入的样本数"""
+        if self.finished:
+            return self.end
+        return self._recorder._write_pos if self._recorder._buffer is self._buffer else self.position
+
+    def read_available(self):
+        """返回自上次读取以来新写入的int16样本（不拷贝），没有新数据时返回None"""
+        end = max(self.available(), self.position)
+        if end == self.position:
+            return None
+        samples = self._buffer[self.position:end]
+        self.position = end
+        return samples
+
+    def samples(self, start, end):
+        """读取指定区间的样本（不拷贝）"""
+        return self._buffer[start:end]
+
+    def abort(self):
+        """放弃本次录音，读取方应尽快停止"""
+        self.aborted = True
+        self._close(self.position)
+
+    def _close(self, end):
+        if not self.finished:
+            self.end = end
+            self.finished = True
 
 class AudioRecorder:
-    def __init__(self):
-        self.sample_rate = 44100
-        self.channels = 1
-        self.frames = []
+    def __init__(self, max_record_time=60.0, preroll_time=0.4, sample_rate=44100, channels=1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        # 目标采样率，非0时在采集过程中逐块重采样并混合为单声道
+        self.target_sample_rate = 0
+        self._resampler = None
+        self.max_record_time = max_record_time
         self.recording = False
         self.stream = None
         self._lock = threading.Lock()
-        self.audio_callback = None  # 添加回调函数
-        
-    def set_audio_callback(self, callback):
-        """设置音频数据回调"""
-        self.audio_callback = callback
-        
+        # 波形电平队列：音频线程只写入电平值，由界面线程按帧率读取
+        self.level_queue = LevelQueue()
+        self.limit_callback = None  # 达到最大录音时间时的回调
+        self.limit_reached = False
+        # 采集健康统计，录音结束后生成报告
+        self.health = CaptureHealth()
+        self.last_health = None
+        # 预分配的int16采集缓冲区，录音数据直接写入其中
+        self._buffer = None
+        self._write_pos = 0
+        self._readers = []  # 本次录音的实时读取方
+        # 常开输入流模式：持续写入环形预录缓冲区，开始录音时拼接到开头
+        self.persistent = False
+        self.preroll_time = preroll_time
+        self._preroll = None
+        self._preroll_pos = 0
+        self._preroll_filled = 0
+
+    def set_limit_callback(self, callback):
+        """设置达到最大录音时间时的回调，在音频线程中调用"""
+        self.limit_callback = callback
+
+    def set_max_record_time(self, max_record_time):
+        """更新最大录音时间，下次录音时重新分配缓冲区"""
+        with self._lock:
+            self.max_record_time = max_record_time
+
+    @property
+    def output_rate(self):
+        """写入缓冲区和WAV文件的采样率"""
+        return self.target_sample_rate or self.sample_rate
+
+    @property
+    def output_channels(self):
+        """写入缓冲区和WAV文件的声道数"""
+        return 1 if self._resampler else self.channels
+
+    def set_device_format(self, sample_rate, channels):
+        """设置录音设备的采样率和声道数，下次打开输入流时生效"""
+        with self._lock:
+            self.sample_rate = sample_rate
+            self.channels = channels
+            self._update_resampler()
+
+    def set_target_sample_rate(self, sample_rate):
+        """设置上传音频的目标采样率，0表示保持设备采样率"""
+        with self._lock:
+            if sample_rate == self.target_sample_rate:
+                return
+            self.target_sample_rate = sample_rate
+            self._update_resampler()
+
+    def _update_resampler(self):
+        if self.target_sample_rate and (self.target_sample_rate != self.sample_rate or self.channels > 1):
+            self._resampler = StreamingResampler(self.sample_rate, self.target_sample_rate)
+        else:
+            self._resampler = None
+        if self.persistent:
+            self._reset_preroll()
+
+    def _convert(self, indata):
+        """把设备音频块转换为输出格式（必要时重采样为单声道）"""
+        if self._resampler:
+            return self._resampler.process(indata)[:, None]
+        return indata
+
+    def _ensure_buffer(self):
+        """按最大录音时间预分配缓冲区，大小不变时复用"""
+        capacity = int(self.max_record_time * self.output_rate)
+        if self._buffer is None or self._buffer.shape != (capacity, self.output_channels):
+            self._buffer = np.zeros((capacity, self.output_channels), dtype=np.int16)
+        self._write_pos = 0
+
+    def _reset_preroll(self):
+        """按预录时长分配环形缓冲区"""
+        size = max(int(self.preroll_time * self.output_rate), 1)
+        self._preroll = np.zeros((size, self.output_channels), dtype=np.int16)
+        self._preroll_pos = 0
+        self._preroll_filled = 0
+
+    def _write_preroll(self, indata):
+        """将音频块写入环形预录缓冲区，覆盖最旧的数据"""
+        size = len(self._preroll)
+        data = indata[-size:]
+        count = len(data)
+        first = min(count, size - self._preroll_pos)
+        float_to_int16(data[:first], self._preroll[self._preroll_pos:self._preroll_pos + first])
+        if count > first:
+            float_to_int16(data[first:], self._preroll[:count - first])
+        self._preroll_pos = (self._preroll_pos + count) % size
+        self._preroll_filled = min(self._preroll_filled + count, size)
+
+    def _copy_preroll(self):
+        """按时间顺序把预录数据拷贝到采集缓冲区开头"""
+        count = min(self._preroll_filled, len(self._buffer))
+        if not count:
+            return
+        start = (self._preroll_pos - count) % len(self._preroll)
+        first = min(count, len(self._preroll) - start)
+        self._buffer[:first] = self._preroll[start:start + first]
+        if count > first:
+            self._buffer[first:count] = self._preroll[:count - first]
+        self._write_pos = count
+        self._preroll_filled = 0
+
+    def _write_block(self, indata):
+        """将float32音频块就地转换为int16写入缓冲区，超出容量的部分丢弃"""
+        pos = self._write_pos
+        count = min(len(indata), len(self._buffer) - pos)
+        if count <= 0:
+            return
+        float_to_int16(indata[:count], self._buffer[pos:pos + count])
+        self._write_pos = pos + count
+
+    def _callback(self, indata, frames, time_info, status):
+        started = time.perf_counter()
+        with self._lock:
+            if self.recording:
+                # 只计算一个电平值写入队列，不在音频线程中操作界面
+                self.level_queue.push(np.sqrt(np.mean(np.square(indata))))
+                self._write_block(self._convert(indata))
+                limit = self._write_pos >= len(self._buffer)
+                if limit:
+                    # 缓冲区已满：停止采集并通知上层自动提交
+                    self.recording = False
+                    self.limit_reached = True
+                self.health.record_callback(frames, status, started, time.perf_counter())
+            elif self.persistent:
+                self._write_preroll(self._convert(indata))
+                return
+            else:
+                return
+        if limit and self.limit_callback:
+            self.limit_callback()
+
+    def _open_stream(self):
+        # 使用更激进的低延迟设置
+        self.stream = sd.InputStream(
+            channels=self.channels,
+            samplerate=self.sample_rate,
+            callback=self._callback,
+            blocksize=256,  # 进一步减小块大小
+            latency='low',
+            device=None,
+            extra_settings=None
+        )
+        self.stream.start()
+
+    def open_persistent_stream(self):
+        """打开常开输入流，之后开始录音无需再打开设备"""
+        if self.persistent:
+            return
+        with self._lock:
+            self._reset_preroll()
+            self.persistent = True
+        try:
+            self._open_stream()
+        except Exception as e:
+            self.persistent = False
+            self.stream = None
+            raise Exception(f"打开录音设备失败: {str(e)}")
+
+    def close_persistent_stream(self):
+        """关闭常开输入流"""
+        if not self.persistent:
+            return
+        self.persistent = False
+        if self.stream and not self.recording:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+    def set_preroll_time(self, preroll_time):
+        """更新预录时长"""
+        with self._lock:
+            self.preroll_time = preroll_time
+            if self.persistent:
+                self._reset_preroll()
+
+    def open_reader(self):
+        """为进行中的录音创建实时读取方，必须在start_recording之后调用"""
+        with self._lock:
+            reader = RecordingReader(self, self._buffer, self.output_rate, self.output_channels)
+            self._readers.append(reader)
+            return reader
+
     def start_recording(self):
         with self._lock:
-            self.frames = []
+            self._ensure_buffer()
+            self.limit_reached = False
+            if self.persistent and self.stream:
+                # 常开模式下把按键前的预录音频拼接到开头
+                self._copy_preroll()
+                self.health.reset(persistent=True)
+                self.recording = True
+                return
+            if self._resampler:
+                self._resampler.reset()
+            self.health.reset()
             self.recording = True
-            
-        def callback(indata, frames, time, status):
-            if self.recording:
-                with self._lock:
-                    # 立即处理音频数据
-                    if self.audio_callback:
-                        self.audio_callback(indata)
-                    self.frames.append(indata.copy())
-        
+
         try:
-            # 使用更激进的低延迟设置
-            self.stream = sd.InputStream(
-                channels=self.channels,
-                samplerate=self.sample_rate,
-                callback=callback,
-                blocksize=256,  # 进一步减小块大小
-                latency='low',
-                device=None,
-                extra_settings=None
-            )
-            # 预先启动流并等待一小段时间以确保稳定
-            self.stream.start()
+            open_start = time.perf_counter()
+            self._open_stream()
+            self.health.open_latency = time.perf_counter() - open_start
+            # 等待一小段时间以确保流稳定
             time.sleep(0.05)  # 短暂等待以确保流启动
         except Exception as e:
             self.recording = False
             raise Exception(f"录音启动失败: {str(e)}")
-    
+
     def stop_recording(self):
         if not self.stream:
             return None
-            
+
         self.recording = False
         try:
-            self.stream.stop()
-            self.stream.close()
-            self.stream = None
-            
+            if not self.persistent:
+                self.stream.stop()
+                self.stream.close()
+                self.stream = None
+
             with self._lock:
-                if not self.frames:  # 检查是否有录音数据
+                self.last_health = self.health.report(self.sample_rate)
+                if self._readers:
+                    for reader in self._readers:
+                        reader._close(self._write_pos)
+                    self._readers = []
+                    # 读取方可能仍在使用缓冲区，下次录音重新分配
+                    buffer, self._buffer = self._buffer, None
+                else:
+                    buffer = self._buffer
+                if not self._write_pos:  # 检查是否有录音数据
                     return None
-                    
-                audio_data = np.concatenate(self.frames, axis=0)
-                byte_io = io.BytesIO()
-                
-                with wave.open(byte_io, 'wb') as wf:
-                    wf.setnchannels(self.channels)
-                    wf.setsampwidth(2)
-                    wf.setframerate(self.sample_rate)
-                    wf.writeframes((audio_data * 32767).astype(np.int16))
-                
-                return byte_io.getvalue()
-                
+
+                # 文件头加缓冲区的内存视图，只在生成最终bytes时拷贝一次
+                pcm = memoryview(buffer[:self._write_pos]).cast('B')
+                header = build_wav_header(pcm.nbytes, self.output_rate, self.output_channels)
+                return b''.join((header, pcm))
+
         except Exception as e:
             raise Exception(f"录音停止失败: {str(e)}")
         finally:
-            self.frames = []
+            self._write_pos = 0
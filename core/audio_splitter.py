@@ -0,0 +1,84 @@
+import numpy as np
+from .vad import VoiceActivityDetector
+from .wav_utils import parse_wav, pcm_to_wav
+
+def join_segments(texts):
+    """按顺序拼接分段转写结果，英文单词之间补空格"""
+    result = ""
+    for text in texts:
+        text = (text or "").strip()
+        if not text:
+            continue
+        if result and result[-1].isascii() and text[0].isascii() and text[0].isalnum():
+            result += " "
+        result += text
+    return result
+
+def _normalized(text):
+    """只保留文字和数字并转为小写，返回(规范化字符列表, 对应的原文下标)"""
+    chars, index = [], []
+    for i, char in enumerate(text):
+        if char.isalnum():
+            chars.append(char.lower())
+            index.append(i)
+    return chars, index
+
+def merge_overlapping(texts, max_overlap=40, min_overlap=2):
+    """拼接相邻部分重叠的分段文本，去掉后一段开头与前一段结尾重复的内容
+
+    比较时忽略标点、空白和大小写，重复内容须落在后一段的词边界上。
+    """
+    merged = []
+    for text in texts:
+        text = (text or "").strip()
+        if merged and text:
+            tail, _ = _normalized(merged[-1][-max_overlap * 2:])
+            head, head_index = _normalized(text[:max_overlap * 2])
+            for k in range(min(len(tail), len(head), max_overlap), min_overlap - 1, -1):
+                if tail[-k:] != head[:k]:
+                    continue
+                cut = head_index[k - 1] + 1
+                # 英文重复须在词边界结束，避免把"the"和"then"当作重叠
+                if text[cut - 1].isascii() and cut < len(text) and text[cut].isascii() and text[cut].isalnum():
+                    continue
+                text = text[cut:].lstrip(" \t\r\n,.;:!?，。；：！？、")
+                break
+        merged.append(text)
+    return join_segments(merged)
+
+class AudioSplitter:
+    """把长录音在低能量处切分为带少量重叠的片段，供多个请求并行转写"""
+
+    SEARCH_RATIO = 0.25  # 在目标切点之前多大比例的片段长度内寻找低能量点
+    SMOOTH_FRAMES = 5  # 能量平滑的帧数，偏向较长的停顿而不是单帧的低谷
+
+    def __init__(self, config_manager):
+        self.config = config_manager
+        self.vad = VoiceActivityDetector(config_manager)
+
+    def split(self, audio_data, segment_time, overlap):
+        """切分WAV数据，返回WAV片段列表；不超过片段时长1.5倍的录音不切分"""
+        pcm, sample_rate, channels = parse_wav(audio_data)
+        total = len(pcm)
+        segment_len = int(segment_time * sample_rate)
+        if segment_len <= 0 or total <= segment_len * 1.5:
+            return [audio_data]
+
+        samples = pcm.mean(axis=1, dtype=np.float32) if channels > 1 else pcm[:, 0].astype(np.float32)
+        energy_db, _, frame_len = self.vad.frame_features(samples / 32768.0, sample_rate)
+        kernel = np.ones(self.SMOOTH_FRAMES, dtype=np.float32) / self.SMOOTH_FRAMES
+        energy_db = np.convolve(energy_db, kernel, mode='same')
+
+        overlap_len = int(overlap * sample_rate)
+        search_len = int(segment_len * self.SEARCH_RATIO)
+        segments = []
+        start = 0
+        while total - start > segment_len * 1.5:
+            target = start + segment_len
+            first = (target - search_len) // frame_len
+            last = target // frame_len
+            cut = (first + int(np.argmin(energy_db[first:last]))) * frame_len + frame_len // 2
+            segments.append(pcm_to_wav(pcm[max(start - overlap_len, 0):cut], sample_rate, channels))
+            start = cut
+        segments.append(pcm_to_wav(pcm[max(start - overlap_len, 0):], sample_rate, channels))
+        return segments
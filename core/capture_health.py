@@ -0,0 +1,69 @@
+import numpy as np
+
+class CaptureHealth:
+    """单次录音的采集健康统计：溢出/欠载次数、回调耗时、丢帧和打开延迟
+
+    record_callback在音频线程中调用，只做计数和写入预分配数组；
+    report在录音结束后计算分位数。
+    """
+
+    def __init__(self, capacity=16384):
+        self._durations = np.zeros(capacity, dtype=np.float64)
+        self.reset()
+
+    def reset(self, open_latency=0.0, persistent=False):
+        """开始新的录音前清空统计"""
+        self.open_latency = open_latency
+        self.persistent = persistent
+        self.overflows = 0
+        self.underflows = 0
+        self.callbacks = 0
+        self.frames = 0
+        self._first_time = None
+        self._last_time = None
+        self._last_frames = 0
+
+    def record_callback(self, frames, status, started, finished):
+        """记录一次音频回调（音频线程）"""
+        if status:
+            if status.input_overflow:
+                self.overflows += 1
+            if status.input_underflow:
+                self.underflows += 1
+        self._durations[self.callbacks % len(self._durations)] = finished - started
+        self.callbacks += 1
+        if self._first_time is None:
+            self._first_time = started
+        self._last_time = started
+        self._last_frames = frames
+        self.frames += frames
+
+    def report(self, sample_rate):
+        """生成本次录音的健康报告"""
+        count = min(self.callbacks, len(self._durations))
+        if count:
+            p50, p99 = np.percentile(self._durations[:count], [50, 99]) * 1000
+        else:
+            p50 = p99 = 0.0
+        expected = 0
+        if self._first_time is not None:
+            # 按第一次到最后一次回调的间隔推算应收到的帧数
+            expected = int(round((self._last_time - self._first_time) * sample_rate)) + self._last_frames
+        return {
+            "overflows": self.overflows,
+            "underflows": self.underflows,
+            "callbacks": self.callbacks,
+            "callback_p50_ms": round(float(p50), 3),
+            "callback_p99_ms": round(float(p99), 3),
+            "frames_expected": expected,
+            "frames_received": self.frames,
+            "frames_missing": max(expected - self.frames, 0),
+            "missing_ms": round(max(expected - self.frames, 0) / sample_rate * 1000, 1),
+            "stream_open_ms": round(self.open_latency * 1000, 1),
+            "persistent_stream": self.persistent
+        }
+
+    @staticmethod
+    def is_healthy(report):
+        """判断采集过程中是否可能丢失了音频"""
+        return not report["overflows"] and report["missing_ms"] < 50
@@ -1,16 +1,34 @@
 import json
 import os
 import time
+import copy
+import threading
 
 class ConfigManager:
     def __init__(self):
         self.config_file = "config.json"
         self.history_file = "history.json"
+        self._history_lock = threading.Lock()  # 转写线程会并发写入历史记录
         self.default_config = {
             "general_settings": {
                 "insert_method": "clipboard",
                 "keyboard_interval": 0.01,
-                "enable_logging": False
+                "enable_logging": False,
+                "transcription_workers": 2,  # 并行转写的线程数
+                "transcription_queue_size": 4,  # 最多同时排队/执行的转写任务数
+                "connect_timeout": 5.0,  # 连接超时(秒)
+                "read_timeout": 60.0,  # 读取超时(秒)
+                "http2": False,  # OpenAI接口启用HTTP/2(需要安装h2)
+                "prewarm_connections": True,  # 按下Ctrl时预先建立到转写/后处理服务的连接
+                "prewarm_interval": 20.0,  # 距上次预热不足此秒数时跳过
+                "timeout_base": 10.0,  # 转写读取超时 = 基础时间 + 每秒音频的时间，不超过read_timeout
+                "timeout_per_audio_second": 1.0,
+                "max_retries": 2,  # 网络错误、限流和5xx的重试次数
+                "retry_base_delay": 0.5,  # 重试退避的基础时间(秒)，每次翻倍并加随机抖动
+                "retry_max_delay": 8.0,  # 单次退避的上限(秒)
+                "breaker_failures": 3,  # 连续失败多少次后熔断该提供商
+                "breaker_cooldown": 30.0,  # 熔断后暂停请求的时间(秒)
+                "rate_limit_max_wait": 120.0  # 配额不足时最多排队等待的时间(秒)
             },
             "api_settings": {
                 # 转录服务设置
@@ -18,17 +36,45 @@ class ConfigManager:
                     "openai": {
                         "api_key": "",
                         "api_url": "https://api.openai.com/v1",
-                        "model": "whisper-1"
+                        "model": "whisper-1",
+                        "sample_rate": 16000,  # 上传音频的采样率，0表示保持录音采样率
+                        "audio_format": "flac",  # 上传格式: wav, flac(无损), opus(有损)，服务端拒绝时自动改用WAV
+                        "streaming_upload": False,  # 边录边传(分块上传WAV)，需服务端支持
+                        "stream_response": False,  # 流式返回转写结果(SSE或JSON行)，边接收边插入，需模型支持
+                        "segment_time": 30.0,  # 长录音切分的片段时长(秒)，0表示不切分
+                        "max_concurrency": 4,  # 同时进行的片段请求数
+                        "api_keys": [],  # 额外的API密钥，与api_key一起分摊请求
+                        "key_strategy": "round_robin",  # 密钥选择: round_robin(轮换), quota(剩余配额最多)
+                        "requests_per_minute": 0,  # 每个密钥每分钟的请求数上限，0表示不限
+                        "audio_seconds_per_hour": 0  # 每个密钥每小时的音频秒数上限，0表示不限
                     },
                     "groq": {
                         "api_key": "",
                         "api_url": "https://api.groq.com/openai/v1",  # Groq固定URL
-                        "model": "whisper-large-v3"
+                        "model": "whisper-large-v3",
+                        "sample_rate": 16000,
+                        "audio_format": "flac",
+                        "segment_time": 30.0,
+                        "max_concurrency": 4,
+                        "api_keys": [],
+                        "key_strategy": "round_robin",
+                        "requests_per_minute": 0,  # 免费额度可设为20次/分钟、7200秒/小时
+                        "audio_seconds_per_hour": 0
                     },
                     "custom": {
                         "api_key": "",
                         "api_url": "",
-                        "model": ""
+                        "model": "",
+                        "sample_rate": 16000,
+                        "audio_format": "wav",  # 自定义服务需确认支持后再改为flac/opus
+                        "streaming_upload": False,
+                        "stream_response": False,  # 自建Whisper服务逐段返回时可开启
+                        "segment_time": 0.0,  # 自建服务通常单卡推理，默认不切分
+                        "max_concurrency": 2,
+                        "api_keys": [],
+                        "key_strategy": "round_robin",
+                        "requests_per_minute": 0,
+                        "audio_seconds_per_hour": 0
                     }
                 },
                 # 后处理服务设置
@@ -44,26 +90,57 @@ class ConfigManager:
                 }
             },
             "transcription_settings": {
-                "provider": "openai",  # openai, groq, custom
+                "provider": "openai",  # openai, groq, custom, auto(按近期耗时自动选择)
                 "post_process": False,
                 "post_process_provider": "openai",  # 只保留 openai, groq
                 "post_process_prompt": "修正文本中的错误，保持原意",
+                "post_process_cache_size": 256,  # 后处理结果缓存条数，0表示不缓存
+                "post_process_cache_ttl": 3600.0,  # 后处理结果缓存有效期(秒)
+                "post_process_bypass_length": 0,  # 不超过此字数且无需清理的短文本跳过后处理，0表示不跳过
+                "post_process_streaming": False,  # 后处理结果边生成边插入，缩短首字出现的时间
+                "post_process_optimistic": False,  # 先插入转写文本，后处理完成后就地修正
                 "wave_window_position": "right-middle",
                 "wave_window_custom_pos": {"x": 0, "y": 0},
                 "remove_punctuation": True,
                 "punctuation_to_remove": "。，,.?？！!",
-                "remove_emoji": True
+                "remove_emoji": True,
+                "live_segmentation": False,  # 录音期间按停顿分段实时转写
+                "segment_min_silence": 0.6,  # 切分所需的最短停顿(秒)
+                "segment_min_length": 3.0,  # 每段的最短时长(秒)，避免切得过碎
+                "segment_overlap": 1.0,  # 长录音切分时相邻片段的重叠时长(秒)
+                "hedge_enabled": False,  # 主提供商响应慢时同时请求备用提供商
+                "hedge_provider": "groq",  # 对冲使用的备用提供商
+                "hedge_percentile": 90,  # 超过主提供商历史耗时的该百分位即触发对冲
+                "hedge_delay": 3.0,  # 历史样本不足时的固定对冲延迟(秒)
+                "hedge_min_delay": 0.5,  # 对冲延迟的下限(秒)
+                "failover_enabled": False,  # 提供商熔断或重试后仍失败时改用备用提供商
+                "failover_provider": "groq",
+                "auto_probe": False,  # auto模式下定期用短音频探测各提供商的耗时（会产生少量API调用）
+                "probe_interval": 300.0  # 提供商超过此秒数没有耗时样本时探测
             },
             "audio_settings": {
                 "sample_rate": 44100,
                 "channels": 1,
                 "trigger_press_time": 0.1,
                 "min_press_time": 0.3,
-                "max_record_time": 60.0
+                "max_record_time": 60.0,
+                "persistent_stream": False,  # 保持录音设备常开，消除开头延迟
+                "preroll_time": 0.4,  # 常开模式下拼接到开头的预录时长(秒)
+                "vad_enabled": True,  # 上传前去除首尾静音
+                "vad_threshold_db": -45.0,  # 语音能量门限(dBFS)
+                "vad_zcr_threshold": 0.25,  # 清辅音过零率门限
+                "vad_padding": 0.3,  # 语音前后保留的余量(秒)
+                "vad_max_pause": 0.0  # 内部停顿压缩上限(秒)，0表示不压缩
             },
             "history_settings": {
                 "max_days": 30,
                 "enabled": True
+            },
+            "cache_settings": {
+                "enabled": True,  # 相同录音直接返回上次的转写结果
+                "max_entries": 200,  # 内存中保留的条目数
+                "disk_enabled": False,  # 同时保存到cache目录，重启后仍可命中
+                "disk_max_mb": 20  # 磁盘缓存的大小上限(MB)
             }
         }
         self.load_config()
@@ -74,14 +151,22 @@ class ConfigManager:
             with open(self.config_file, 'r', encoding='utf-8') as f:
                 saved_config = json.load(f)
                 # 合并保存的配置和默认配置，确保新添加的配置项存在
-                self.config = self.default_config.copy()
+                self.config = copy.deepcopy(self.default_config)
                 for section in saved_config:
                     if section in self.config:
-                        self.config[section].update(saved_config[section])
+                        self._merge_config(self.config[section], saved_config[section])
         else:
-            self.config = self.default_config.copy()
+            self.config = copy.deepcopy(self.default_config)
             self.save_config()
     
+    def _merge_config(self, target, saved):
+        """递归合并配置，保留嵌套配置中新添加的默认项"""
+        for key, value in saved.items():
+            if isinstance(value, dict) and isinstance(target.get(key), dict):
+                self._merge_config(target[key], value)
+            else:
+                target[key] = value
+    
     def save_config(self):
         with open(self.config_file, 'w', encoding='utf-8') as f:
             json.dump(self.config, f, indent=4, ensure_ascii=False)
@@ -99,21 +184,28 @@ class ConfigManager:
         with open(self.history_file, 'w', encoding='utf-8') as f:
             json.dump(self.history, f, indent=4, ensure_ascii=False)
             
-    def add_history(self, text):
-        """添加历史记录"""
+    def add_history(self, text, capture_health=None):
+        """添加历史记录，可附带本次录音的采集健康报告"""
         if not self.config["history_settings"]["enabled"]:
             return
             
+        with self._history_lock:
+            self._add_history(text, capture_health)
+    
+    def _add_history(self, text, capture_health):
         date = time.strftime("%Y-%m-%d")
         timestamp = time.strftime("%H:%M:%S")
         
         if date not in self.history:
             self.history[date] = []
             
-        self.history[date].append({
+        record = {
             "text": text,
             "time": timestamp
-        })
+        }
+        if capture_health:
+            record["capture_health"] = capture_health
+        self.history[date].append(record)
         
         # 清理超过最大天数的记录
         dates = sorted(self.history.keys(), reverse=True)
@@ -0,0 +1,138 @@
+import threading
+import time
+import httpx
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+from .logger import Logger
+
+class HttpClientPool:
+    """按提供商复用的长连接HTTP会话和API客户端
+
+    每个提供商持有一个requests会话和一个OpenAI客户端，跨多次转写复用连接，
+    省去每次请求的DNS、TCP和TLS握手；只有对应的api_settings或网络设置变化时才重建。
+    """
+
+    def __init__(self, config_manager):
+        self.config = config_manager
+        self.logger = Logger(config_manager)
+        self._lock = threading.Lock()
+        self._sessions = {}  # key -> (指纹, requests.Session)
+        self._clients = {}  # key -> (指纹, openai.OpenAI, httpx.Client)
+        self._warmed = {}  # key -> 上次预热时间
+
+    def timeout(self, audio_seconds=None):
+        """requests使用的(连接超时, 读取超时)
+
+        给出音频时长时，读取超时按 基础时间 + 每秒音频的时间 计算，不超过read_timeout，
+        短录音卡住时不必等满整个read_timeout。
+        """
+        settings = self.config.config["general_settings"]
+        read_timeout = settings["read_timeout"]
+        if audio_seconds is not None:
+            read_timeout = min(read_timeout, settings["timeout_base"] + settings["timeout_per_audio_second"] * audio_seconds)
+        return (settings["connect_timeout"], read_timeout)
+
+    def _network_fingerprint(self):
+        settings = self.config.config["general_settings"]
+        return (settings["connect_timeout"], settings["read_timeout"], settings["http2"])
+
+    def session(self, key, api_key):
+        """获取提供商的requests会话，api_key或网络设置变化时重建"""
+        fingerprint = (api_key, self._network_fingerprint())
+        with self._lock:
+            cached = self._sessions.get(key)
+            if cached and cached[0] == fingerprint:
+                return cached[1]
+            # 旧会话可能仍被进行中的请求使用，不主动关闭
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Authorization"] = f"Bearer {api_key}"
+            self._sessions[key] = (fingerprint, session)
+            self.logger.debug(f"创建HTTP会话: {key}")
+            return session
+
+    def openai_client(self, key, api_key, api_url):
+        """获取提供商的OpenAI客户端，设置变化时重建"""
+        fingerprint = (api_key, api_url, self._network_fingerprint())
+        with self._lock:
+            cached = self._clients.get(key)
+            if cached and cached[0] == fingerprint:
+                return cached[1]
+            connect_timeout, read_timeout = self.timeout()
+            http_client = self._create_httpx_client(connect_timeout, read_timeout)
+            client = openai.OpenAI(
+                api_key=api_key,
+                base_url=api_url,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                http_client=http_client,
+                max_retries=0  # 重试由ResilienceLayer统一处理
+            )
+            self._clients[key] = (fingerprint, client, http_client)
+            self.logger.debug(f"创建OpenAI客户端: {key}")
+            return client
+
+    def _create_httpx_client(self, connect_timeout, read_timeout):
+        http2 = self.config.config["general_settings"]["http2"]
+        if http2:
+            try:
+                import h2  # noqa: F401  httpx的HTTP/2支持依赖h2
+            except ImportError:
+                self.logger.warning("未安装h2，HTTP/2不可用，使用HTTP/1.1")
+                http2 = False
+        return httpx.Client(
+            http2=http2,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=8, max_keepalive_connections=4, keepalive_expiry=120)
+        )
+
+    def prewarm(self, targets):
+        """在后台线程中预先建立连接
+
+        targets为(类型, key, api_key, url)列表，类型为"session"或"openai"。
+        完成DNS解析和TLS握手后连接留在连接池中，随后的上传直接复用。
+        """
+        if not targets:
+            return None
+        thread = threading.Thread(target=self._prewarm, args=(targets,), daemon=True)
+        thread.start()
+        return thread
+
+    def _prewarm(self, targets):
+        interval = self.config.config["general_settings"]["prewarm_interval"]
+        for kind, key, api_key, url in targets:
+            if not url:
+                continue
+            now = time.monotonic()
+            with self._lock:
+                # 最近预热过的连接仍处于保活期，无需重复预热
+                if now - self._warmed.get(key, -interval) < interval:
+                    continue
+                self._warmed[key] = now
+            start = time.perf_counter()
+            try:
+                if kind == "openai":
+                    self.openai_client(key, api_key, url)
+                    with self._lock:
+                        http_client = self._clients[key][2]
+                    http_client.head(url, timeout=self.timeout()[0] * 2)
+                else:
+                    self.session(key, api_key).head(url, timeout=self.timeout(), allow_redirects=False)
+                self.logger.debug(f"连接预热完成: {key} {(time.perf_counter() - start) * 1000:.0f}ms")
+            except Exception as e:
+                # 预热失败不影响正常请求，正式上传时会重新建立连接
+                with self._lock:
+                    self._warmed.pop(key, None)
+                self.logger.debug(f"连接预热失败: {key} {str(e)}")
+
+    def close(self):
+        """关闭所有连接"""
+        with self._lock:
+            for _, session in self._sessions.values():
+                session.close()
+            for _, client, http_client in self._clients.values():
+                client.close()
+            self._sessions.clear()
+            self._clients.clear()
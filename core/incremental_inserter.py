@@ -0,0 +1,38 @@
+class IncrementalInserter:
+    """把流式到达的文本增量按词或句子边界分批插入
+
+    每次插入都要操作剪贴板或模拟按键，逐个token插入太慢也容易把英文单词拆开，
+    因此只在标点或空白之后切分；插入期间到达的增量会累积到下一批一起插入。
+    """
+
+    BOUNDARY = set("。！？；，、：!?;,:\n ")  # 在这些字符之后可以安全切分
+    MAX_PENDING = 12  # 非ASCII文字没有边界时，累积到此长度也插入
+
+    def __init__(self, insert):
+        self.insert = insert  # 插入函数 insert(text, settle)
+        self.pending = ""
+        self.inserted = ""
+
+    def feed(self, delta):
+        self.pending += delta
+        if not self.inserted:
+            self.pending = self.pending.lstrip()
+        cut = max((i + 1 for i, char in enumerate(self.pending) if char in self.BOUNDARY), default=0)
+        if not cut and len(self.pending) >= self.MAX_PENDING and not self.pending[-1].isascii():
+            cut = len(self.pending)
+        if cut and self.pending[:cut].strip():
+            self._flush(self.pending[:cut])
+            self.pending = self.pending[cut:]
+
+    def finish(self):
+        """插入剩余文本，返回已插入的全部文本"""
+        rest = self.pending.rstrip()
+        self.pending = ""
+        if rest:
+            self._flush(rest)
+        return self.inserted
+
+    def _flush(self, text):
+        # 只有第一次插入需要等待焦点切换回目标窗口
+        self.insert(text, not self.inserted)
+        self.inserted += text
@@ -1,25 +1,46 @@
 from pynput import keyboard
 from core.audio_recorder import AudioRecorder
+from core.vad import VoiceActivityDetector
+from core.capture_health import CaptureHealth
+from core.logger import Logger
 import time
+import threading
 from PyQt6.QtCore import QObject, pyqtSignal
 
 class KeyboardListener(QObject):
     recording_started = pyqtSignal()  # 录音开始信号
     recording_stopped = pyqtSignal()  # 录音结束信号
-    transcribe_requested = pyqtSignal(bytes)  # 转写请求信号
+    transcribe_requested = pyqtSignal(bytes, dict, object)  # 转写请求信号(音频数据, 采集健康报告, 流式上传)
     start_timer_requested = pyqtSignal()  # 新增：请求启动定时器的信号
     stop_timer_requested = pyqtSignal()   # 新增：请求停止定时器的信号
+    max_time_reached = pyqtSignal()  # 录音达到最大时长的信号（来自音频线程）
     
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
-        self.recorder = AudioRecorder()
         self.is_recording = False
+        self.streaming_upload = None  # 本次录音的边录边传请求（流式上传或分段转写）
         self.is_key_pressed = False
+        # 热键松开时为set，转写任务等它松开后才插入文本（按住Ctrl时模拟输入会变成快捷键）
+        self.hotkey_released = threading.Event()
+        self.hotkey_released.set()
+        self.main_window.transcription_executor.set_hotkey_state(self.hotkey_released)
+        self.auto_submitted = False  # 本次按键的录音是否已因超时自动提交
+        self._state_lock = threading.Lock()  # 按键线程和主线程都会结束录音
         self.press_time = 0  # 记录按键按下的时间
         self.trigger_press_time = self.main_window.config_manager.config["audio_settings"]["trigger_press_time"]
         self.min_press_time = self.main_window.config_manager.config["audio_settings"]["min_press_time"]
         self.max_record_time = self.main_window.config_manager.config["audio_settings"]["max_record_time"]
+        audio_settings = self.main_window.config_manager.config["audio_settings"]
+        self.recorder = AudioRecorder(
+            self.max_record_time,
+            audio_settings["preroll_time"],
+            audio_settings["sample_rate"],
+            audio_settings["channels"]
+        )
+        self._update_target_sample_rate()
+        self.vad = VoiceActivityDetector(self.main_window.config_manager)
+        self.logger = Logger(self.main_window.config_manager)
         
         # 连接信号
         self.recording_started.connect(self.main_window.start_recording)
@@ -37,14 +58,41 @@ class KeyboardListener(QObject):
         )
         self.listener.start()
         
-        self.recorder.set_audio_callback(self.main_window.update_wave_data)
+        self.main_window.set_level_queue(self.recorder.level_queue)
+        # 音频线程中只发射信号，实际的停止和提交在主线程完成
+        self.max_time_reached.connect(self.on_max_time_reached)
+        self.recorder.set_limit_callback(self.max_time_reached.emit)
+        self._apply_persistent_stream()
+    
+    def _update_target_sample_rate(self):
+        """按当前转写提供商设置采集时的目标采样率"""
+        config = self.main_window.config_manager.config
+        provider = config["transcription_settings"]["provider"]
+        if provider == "auto":
+            # 录音结束后才选定提供商，按各提供商中最高的上传采样率采集
+            sample_rate = max(s.get("sample_rate", 0) for s in config["api_settings"]["transcription"].values())
+        else:
+            sample_rate = config["api_settings"]["transcription"].get(provider, {}).get("sample_rate", 0)
+        self.recorder.set_target_sample_rate(sample_rate)
+    
+    def _apply_persistent_stream(self):
+        """根据设置打开或关闭常开输入流"""
+        if self.main_window.config_manager.config["audio_settings"]["persistent_stream"]:
+            try:
+                self.recorder.open_persistent_stream()
+            except Exception as e:
+                print(f"常开录音模式启动失败: {str(e)}")
+        else:
+            self.recorder.close_persistent_stream()
     
     def start_recording(self):
         """实际启动录音的函数"""
         if self.is_key_pressed:  # 确保按键仍然被按住
             try:
                 self.is_recording = True
+                self._update_target_sample_rate()
                 self.recorder.start_recording()
+                self._start_streaming_upload()
                 self.recording_started.emit()
             except Exception as e:
                 print(f"录音启动失败: {str(e)}")
@@ -53,6 +101,8 @@ class KeyboardListener(QObject):
     def on_press(self, key):
         if key == keyboard.Key.ctrl_l and not self.is_key_pressed:
             self.is_key_pressed = True
+            self.hotkey_released.clear()
+            self.auto_submitted = False
             self.press_time = time.time()
             # 发送启动定时器的请求
             self.start_timer_requested.emit()
@@ -60,36 +110,117 @@ class KeyboardListener(QObject):
     def on_release(self, key):
         if key == keyboard.Key.ctrl_l and self.is_key_pressed:
             self.is_key_pressed = False
+            self.hotkey_released.set()
             # 发送停止定时器的请求
             self.stop_timer_requested.emit()
             press_duration = time.time() - self.press_time
             
-            if self.is_recording:
-                self.is_recording = False
+            if self._claim_recording():
                 self.recording_stopped.emit()
                 
                 if press_duration < self.min_press_time:
                     self.recorder.stop_recording()
+                    self._abort_streaming_upload()
                     self.main_window.update_status(
                         f"录音时间太短(小于{self.min_press_time}秒)，已取消"
                     )
                     return
                     
-                if press_duration > self.max_record_time:
-                    self.main_window.update_status(
-                        f"录音时间过长(超过{self.max_record_time}秒)，仅保留前{self.max_record_time}秒"
-                    )
-                
-                audio_data = self.recorder.stop_recording()
-                if audio_data:
-                    self.transcribe_requested.emit(audio_data)
-                else:
-                    self.main_window.update_status("未检测到录音数据")
-            else:
+                self._submit_recording()
+            elif not self.auto_submitted:
                 self.main_window.update_status("按键时间太短，未启动录音")
+    
+    def on_max_time_reached(self):
+        """录音缓冲区写满时自动停止并提交转写"""
+        if not self._claim_recording():
+            return
+        self.auto_submitted = True
+        self.recording_stopped.emit()
+        self.main_window.update_status(
+            f"录音达到最大时长({self.max_record_time}秒)，已自动停止并提交"
+        )
+        self._submit_recording()
+    
+    def _start_streaming_upload(self):
+        """启用边录边传时，录音一开始就开始分段转写或打开上传请求"""
+        self.streaming_upload = None
+        manager = self.main_window.transcription_manager
+        try:
+            if manager.live_segmentation_enabled():
+                self.streaming_upload = manager.start_live_segmentation(self.recorder.open_reader())
+            elif manager.streaming_upload_enabled():
+                self.streaming_upload = manager.start_streaming_upload(self.recorder.open_reader())
+        except Exception as e:
+            print(f"边录边传启动失败: {str(e)}")
+    
+    def _abort_streaming_upload(self):
+        if self.streaming_upload:
+            self.streaming_upload.abort()
+            self.streaming_upload = None
+    
+    def _claim_recording(self):
+        """原子地结束录音状态，只有一个线程能拿到本次录音"""
+        with self._state_lock:
+            if not self.is_recording:
+                return False
+            self.is_recording = False
+            return True
+    
+    def _submit_recording(self):
+        """停止录音并提交转写请求"""
+        audio_data = self.recorder.stop_recording()
+        health = self.recorder.last_health or {}
+        self._log_capture_health(health)
+        streaming_upload, self.streaming_upload = self.streaming_upload, None
+        if audio_data:
+            audio_data = self._trim_silence(audio_data)
+            if audio_data:
+                self.transcribe_requested.emit(audio_data, health, streaming_upload)
+                return
+        else:
+            self.main_window.update_status("未检测到录音数据")
+        if streaming_upload:
+            streaming_upload.abort()
+
+    def _log_capture_health(self, health):
+        """记录采集健康报告，区分本地丢帧和模型识别问题"""
+        if not health:
+            return
+        message = (
+            f"采集健康: 溢出{health['overflows']}次, 欠载{health['underflows']}次, "
+            f"回调耗时p50={health['callback_p50_ms']}ms p99={health['callback_p99_ms']}ms, "
+            f"帧数 {health['frames_received']}/{health['frames_expected']} "
+            f"(缺失{health['missing_ms']}ms), 打开设备{health['stream_open_ms']}ms"
+        )
+        if CaptureHealth.is_healthy(health):
+            self.logger.info(message)
+        else:
+            self.logger.warning(message)
+
+    def _trim_silence(self, audio_data):
+        """上传前去除静音，整段为静音时返回None"""
+        if not self.main_window.config_manager.config["audio_settings"]["vad_enabled"]:
+            return audio_data
+        try:
+            trimmed, _ = self.vad.trim(audio_data)
+        except Exception as e:
+            self.logger.error(f"静音裁剪失败: {str(e)}")
+            return audio_data
+        if trimmed is None:
+            self.main_window.update_status("未检测到语音，已取消转写")
+        return trimmed
 
     def update_settings(self):
         """更新设置"""
         self.trigger_press_time = self.main_window.config_manager.config["audio_settings"]["trigger_press_time"]
         self.min_press_time = self.main_window.config_manager.config["audio_settings"]["min_press_time"]
         self.max_record_time = self.main_window.config_manager.config["audio_settings"]["max_record_time"]
+        self.recorder.set_max_record_time(self.max_record_time)
+        audio_settings = self.main_window.config_manager.config["audio_settings"]
+        self.recorder.set_preroll_time(audio_settings["preroll_time"])
+        if (audio_settings["sample_rate"], audio_settings["channels"]) != (self.recorder.sample_rate, self.recorder.channels):
+            # 设备格式变化时需要重新打开常开输入流
+            self.recorder.close_persistent_stream()
+            self.recorder.set_device_format(audio_settings["sample_rate"], audio_settings["channels"])
+        self._update_target_sample_rate()
+        self._apply_persistent_stream()
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+
+class LatencyTracker:
+    """记录各提供商/模型最近的转写耗时
+
+    每个样本保存(音频时长, 耗时, 记录时间)。统计量有三种：
+    - 按音频时长归一化的"每秒音频耗时"的指数滑动平均(EWMA)，反映最新速度；
+    - 最近样本窗口上的归一化耗时百分位，用于对冲的延迟期限；
+    - 对近期样本按时间衰减加权拟合 耗时 = 固定开销 + 每秒耗时 × 时长，
+      用于按录音时长预估耗时：短录音看固定开销，长录音看吞吐。
+    不足1秒的音频按1秒归一化。旧样本的权重按HALF_LIFE随时间减半，
+    偶尔一次很慢的请求不会让提供商一直被判定为慢。
+    """
+
+    WINDOW = 200  # 每个key保留的最近样本数
+    MIN_SAMPLES = 10  # 计算百分位所需的最少样本数
+    EWMA_ALPHA = 0.2
+    FIT_DECAY = 0.9  # 拟合时每早一个样本权重乘以该系数
+    FIT_MIN_SAMPLES = 4
+    FIT_MIN_SPREAD = 2.0  # 样本时长跨度(秒)不足时无法区分开销和吞吐，只用EWMA
+    HALF_LIFE = 600.0  # 样本权重随时间减半的周期(秒)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}  # key -> deque[(音频时长, 耗时, 记录时间)]
+        self._ewma = {}  # key -> 每秒音频耗时的EWMA
+
+    def record(self, key, latency, audio_seconds):
+        normalized = latency / max(audio_seconds, 1.0)
+        now = time.monotonic()
+        with self._lock:
+            samples = self._samples.setdefault(key, deque(maxlen=self.WINDOW))
+            previous = self._ewma.get(key)
+            if previous is None:
+                self._ewma[key] = normalized
+            else:
+                # 距上一个样本越久，旧的平均值权重越小
+                keep = (1 - self.EWMA_ALPHA) * self._decay(now - samples[-1][2])
+                self._ewma[key] = keep * previous + (1 - keep) * normalized
+            samples.append((audio_seconds, latency, now))
+
+    def _decay(self, age):
+        return 0.5 ** (age / self.HALF_LIFE)
+
+    def percentile(self, key, percent):
+        """归一化耗时的百分位，样本不足时返回None"""
+        with self._lock:
+            samples = self._samples.get(key)
+            if not samples or len(samples) < self.MIN_SAMPLES:
+                return None
+            normalized = [latency / max(seconds, 1.0) for seconds, latency, _ in samples]
+        return float(np.percentile(normalized, percent))
+
+    def last_recorded(self, key):
+        """最近一次记录的时间(time.monotonic)，没有样本时返回None"""
+        with self._lock:
+            samples = self._samples.get(key)
+            return samples[-1][2] if samples else None
+
+    def estimate(self, key, audio_seconds):
+        """预估指定时长音频的转写耗时(秒)，没有样本时返回None"""
+        with self._lock:
+            samples = self._samples.get(key)
+            if not samples:
+                return None
+            ewma = self._ewma[key]
+            recent = list(samples)[-50:]
+        if len(recent) >= self.FIT_MIN_SAMPLES:
+            durations = np.array([s[0] for s in recent])
+            if durations.max() - durations.min() >= self.FIT_MIN_SPREAD:
+                latencies = np.array([s[1] for s in recent])
+                ages = time.monotonic() - np.array([s[2] for s in recent])
+                weights = self.FIT_DECAY ** np.arange(len(recent) - 1, -1, -1) * self._decay(ages)
+                slope, intercept = np.polyfit(durations, latencies, 1, w=np.sqrt(weights))
+                if slope >= 0 and intercept >= 0:
+                    return float(intercept + slope * audio_seconds)
+        return ewma * max(audio_seconds, 1.0)
+
+    def report(self):
+        """各key的样本数和EWMA，用于日志"""
+        with self._lock:
+            return {key: (len(self._samples[key]), self._ewma[key]) for key in self._samples}
@@ -0,0 +1,31 @@
+import numpy as np
+
+class LevelQueue:
+    """单生产者/单消费者的无锁电平队列
+
+    音频线程只调用push写入一个电平值，界面线程按自己的帧率调用drain读取。
+    写入位置和读取位置各自只由一个线程修改，依赖整数赋值的原子性而无需加锁，
+    消费者来不及读取时最旧的数据会被覆盖。
+    """
+
+    def __init__(self, capacity=1024):
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._capacity = capacity
+        self._write_index = 0  # 只由生产者修改
+        self._read_index = 0  # 只由消费者修改
+
+    def push(self, level):
+        """写入一个电平值（音频线程）"""
+        index = self._write_index
+        self._data[index % self._capacity] = level
+        self._write_index = index + 1
+
+    def drain(self):
+        """读取上次以来写入的全部电平值（界面线程）"""
+        end = self._write_index
+        start = max(self._read_index, end - self._capacity)
+        self._read_index = end
+        if start == end:
+            return self._data[:0]
+        indices = np.arange(start, end) % self._capacity
+        return self._data[indices]
@@ -0,0 +1,120 @@
+import threading
+import time
+import numpy as np
+from .vad import VoiceActivityDetector
+from .audio_splitter import join_segments
+from .wav_utils import pcm_to_wav
+
+class LiveSegmenter:
+    """边录边转写：在录音过程中按停顿切分语音，说完的句子立即提交转写
+
+    后台线程持续分析RecordingReader中新写入的音频，当语音之后出现足够长的静音
+    且当前段已达到最短长度时，在静音中点切开并提交该段。松开按键时只剩最后一段
+    需要等待，长录音的延迟取决于最后一句而不是整段录音。
+    """
+
+    POLL_INTERVAL = 0.05  # 等待新音频数据的间隔(秒)
+    MIN_SPEECH_TIME = 0.1  # 一段中至少包含的语音时长(秒)，过滤按键声等短促噪声
+
+    def __init__(self, transcription_manager, reader, provider):
+        self.manager = transcription_manager
+        self.config = transcription_manager.config
+        # 复用管理器的日志对象和VAD，每次新建Logger会清空日志文件
+        self.logger = transcription_manager.logger
+        self.vad = transcription_manager.splitter.vad
+        self.reader = reader
+        self.provider = provider
+        settings = self.config.config["transcription_settings"]
+        rate = reader.sample_rate
+        self.min_silence = int(settings["segment_min_silence"] * rate)
+        self.min_length = int(settings["segment_min_length"] * rate)
+        self.min_speech_frames = max(int(self.MIN_SPEECH_TIME / VoiceActivityDetector.FRAME_TIME), 1)
+        self._segments = []  # 按顺序排列的各段转写Future
+        self._segment_start = 0  # 当前段的起始样本
+        self._analyzed = 0  # 已分析到的样本位置
+        self._silence_start = None  # 当前静音的起始样本
+        self._speech_frames = 0  # 当前段内的语音帧数
+        self._energies = []  # 已分析帧的能量，用于估计噪声底
+        self._error = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def abort(self):
+        """放弃本次录音，未开始的分段不再转写"""
+        self.reader.abort()
+        for future in self._segments:
+            future.cancel()
+
+    def finish(self):
+        """等待所有分段转写完成，返回按顺序拼接的文本"""
+        self._done.wait()
+        if self._error:
+            raise self._error
+        texts = [future.result() for future in self._segments]
+        self.logger.info(f"分段转写完成: 共{len(texts)}段")
+        return join_segments(texts)
+
+    def _run(self):
+        try:
+            frame_len = max(int(self.reader.sample_rate * VoiceActivityDetector.FRAME_TIME), 1)
+            while not self.reader.aborted:
+                # 先读结束标志，保证结束前写入的数据都会被分析
+                finished = self.reader.finished
+                available = self.reader.available()
+                if available - self._analyzed >= frame_len:
+                    self._analyze(available)
+                elif finished:
+                    self._submit_last()
+                    break
+                else:
+                    time.sleep(self.POLL_INTERVAL)
+        except Exception as e:
+            self.logger.error(f"分段转写失败: {str(e)}")
+            self._error = e
+        finally:
+            self._done.set()
+
+    def _analyze(self, available):
+        """检测新数据中的停顿，满足条件时切出一段提交转写"""
+        pcm = self.reader.samples(self._analyzed, available)
+        samples = pcm.mean(axis=1, dtype=np.float32) if pcm.shape[1] > 1 else pcm[:, 0].astype(np.float32)
+        samples /= 32768.0
+        energy_db, zcr, frame_len = self.vad.frame_features(samples, self.reader.sample_rate)
+        self._energies.append(energy_db)
+        noise_floor = np.percentile(np.concatenate(self._energies), 10)
+        speech = self.vad.classify(energy_db, zcr, noise_floor)
+
+        for i, is_speech in enumerate(speech):
+            position = self._analyzed + i * frame_len
+            if is_speech:
+                self._silence_start = None
+                self._speech_frames += 1
+                continue
+            if self._silence_start is None:
+                self._silence_start = position
+            silence = position + frame_len - self._silence_start
+            if (self._speech_frames >= self.min_speech_frames
+                    and silence >= self.min_silence
+                    and self._silence_start - self._segment_start >= self.min_length):
+                cut = self._silence_start + silence // 2
+                self._submit(self._segment_start, cut)
+                self._segment_start = cut
+                self._speech_frames = 0
+        self._analyzed += len(speech) * frame_len
+
+    def _submit_last(self):
+        """录音结束后提交最后一段，只有静音时跳过"""
+        end = self.reader.end
+        if end > self._segment_start and (self._speech_frames > 0 or not self._segments):
+            self._submit(self._segment_start, end)
+
+    def _submit(self, start, end):
+        index = len(self._segments) + 1
+        rate = self.reader.sample_rate
+        self.logger.debug(f"提交第{index}段: {start / rate:.2f}-{end / rate:.2f}秒")
+        audio_data = pcm_to_wav(self.reader.samples(start, end), rate, self.reader.channels)
+        self._segments.append(self.manager.submit_segment(audio_data, self.provider))
@@ -0,0 +1,126 @@
+import threading
+import time
+from .logger import Logger
+
+class TokenBucket:
+    """令牌桶：容量为每个周期的配额，按周期匀速补充"""
+
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """取得amount个令牌还需等待的秒数；超过容量的请求在桶满时放行"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def fraction(self):
+        """剩余配额的比例"""
+        return self.tokens / self.capacity
+
+class KeyBudget:
+    """单个API密钥的请求数和音频时长配额"""
+
+    def __init__(self, requests_per_minute, audio_seconds_per_hour):
+        self.requests = TokenBucket(requests_per_minute, 60.0) if requests_per_minute > 0 else None
+        self.audio = TokenBucket(audio_seconds_per_hour, 3600.0) if audio_seconds_per_hour > 0 else None
+        self.blocked_until = 0.0  # 服务端返回429后暂停使用到此时间
+
+    def wait_time(self, audio_seconds, now):
+        wait = max(self.blocked_until - now, 0.0)
+        if self.requests:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.audio:
+            wait = max(wait, self.audio.wait_time(audio_seconds, now))
+        return wait
+
+    def consume(self, audio_seconds):
+        if self.requests:
+            self.requests.consume(1)
+        if self.audio:
+            self.audio.consume(audio_seconds)
+
+    def remaining(self):
+        """剩余配额比例（取两种配额中较少的），不限额时为1"""
+        fractions = [bucket.fraction() for bucket in (self.requests, self.audio) if bucket]
+        return min(fractions) if fractions else 1.0
+
+class RateLimiter:
+    """客户端限流：按提供商的每个API密钥维护令牌桶，在多个密钥间分配请求
+
+    配额不足时请求在此排队等待而不是直接失败，等待超过rate_limit_max_wait才报错。
+    密钥选择策略：round_robin依次轮换，quota优先使用剩余配额最多的密钥。
+    """
+
+    def __init__(self, config_manager):
+        self.config = config_manager
+        self.logger = Logger(config_manager)
+        self._condition = threading.Condition()
+        self._budgets = {}  # (提供商, 密钥) -> (限额设置, KeyBudget)
+        self._cursor = {}  # 提供商 -> 轮换位置
+
+    def _budget(self, provider, key, limits):
+        cached = self._budgets.get((provider, key))
+        if not cached or cached[0] != limits:
+            cached = (limits, KeyBudget(*limits))
+            self._budgets[(provider, key)] = cached
+        return cached[1]
+
+    def acquire(self, provider, keys, audio_seconds):
+        """为一次请求选择API密钥并扣除配额，配额不足时阻塞等待"""
+        settings = self.config.config["api_settings"]["transcription"][provider]
+        limits = (settings.get("requests_per_minute", 0), settings.get("audio_seconds_per_hour", 0))
+        strategy = settings.get("key_strategy", "round_robin")
+        max_wait = self.config.config["general_settings"]["rate_limit_max_wait"]
+        deadline = time.monotonic() + max_wait
+        waited = False
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                budgets = [(key, self._budget(provider, key, limits)) for key in keys]
+                waits = [budget.wait_time(audio_seconds, now) for _, budget in budgets]
+                ready = [i for i, wait in enumerate(waits) if wait == 0]
+                if ready:
+                    if strategy == "quota":
+                        index = max(ready, key=lambda i: budgets[i][1].remaining())
+                    else:
+                        cursor = self._cursor.get(provider, 0)
+                        index = min(ready, key=lambda i: (i - cursor) % len(budgets))
+                        self._cursor[provider] = index + 1
+                    key, budget = budgets[index]
+                    budget.consume(audio_seconds)
+                    if waited:
+                        self.logger.info(f"{provider} 限流排队结束")
+                    return key
+                wait = min(waits)
+                if now + wait > deadline:
+                    raise Exception(f"{provider} 请求超出速率限制，排队{max_wait:.0f}秒仍无可用配额")
+                if not waited:
+                    self.logger.info(f"{provider} 配额不足，排队等待{wait:.1f}秒")
+                    waited = True
+                self._condition.wait(wait)
+
+    def penalize(self, provider, key, keys, retry_after):
+        """服务端限流(429)时暂停使用该密钥，返回是否还有其他可立即使用的密钥"""
+        with self._condition:
+            now = time.monotonic()
+            cached = self._budgets.get((provider, key))
+            if cached:
+                cached[1].blocked_until = now + (retry_after if retry_after is not None else 5.0)
+            self._condition.notify_all()
+            return any(
+                (provider, other) in self._budgets and self._budgets[(provider, other)][1].wait_time(0, now) == 0
+                for other in keys if other != key
+            )
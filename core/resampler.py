@@ -0,0 +1,52 @@
+import numpy as np
+from math import gcd
+
+class StreamingResampler:
+    """流式多相重采样器，逐块把多声道float32音频转换为目标采样率的单声道"""
+
+    def __init__(self, in_rate, out_rate, taps_per_phase=48, beta=8.0):
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        divisor = gcd(self.in_rate, self.out_rate)
+        self.up = self.out_rate // divisor
+        self.down = self.in_rate // divisor
+        self.taps = taps_per_phase
+        self.bank = self._design_bank(beta)
+        self._tap_offsets = np.arange(self.taps)
+        self.reset()
+
+    def _design_bank(self, beta):
+        """设计Kaiser窗低通滤波器并拆分为多相滤波器组"""
+        length = self.taps * self.up
+        # 截止频率取两个采样率中较低的奈奎斯特频率，留出10%过渡带
+        cutoff = 0.45 / max(self.up, self.down)
+        n = np.arange(length) - (length - 1) / 2
+        h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta)
+        h *= self.up / h.sum()  # 每个相位的直流增益为1
+        # bank[phase, j] = h[phase + j * up]
+        return h.reshape(self.taps, self.up).T.astype(np.float32).copy()
+
+    def reset(self):
+        """清空滤波器状态，开始新的录音前调用"""
+        self._tail = np.zeros(self.taps - 1, dtype=np.float32)
+        self._consumed = 0
+        self._next_out = 0
+
+    def process(self, block):
+        """处理一个音频块，返回本块可输出的单声道float32样本"""
+        mono = block.mean(axis=1, dtype=np.float32) if block.ndim > 1 else block.astype(np.float32, copy=False)
+        if self.up == self.down:
+            return mono
+        buf = np.concatenate((self._tail, mono))
+        buf_start = self._consumed - len(self._tail)
+        self._consumed += len(mono)
+        self._tail = buf[len(buf) - (self.taps - 1):]
+        # 输出样本k对应的最新输入样本为 k * down // up，必须已经到达
+        end = -(-self._consumed * self.up // self.down)
+        if end <= self._next_out:
+            return np.zeros(0, dtype=np.float32)
+        positions = np.arange(self._next_out, end, dtype=np.int64) * self.down
+        self._next_out = end
+        base = positions // self.up - buf_start
+        windows = buf[base[:, None] - self._tap_offsets[None, :]]
+        return np.einsum('ij,ij->i', windows, self.bank[positions % self.up])
@@ -0,0 +1,179 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import httpx
+import openai
+import requests
+from .logger import Logger
+
+RETRY_STATUS = (408, 409, 425, 429, 500, 502, 503, 504)  # 可重试的HTTP状态码
+
+class TransientError(Exception):
+    """可重试的临时错误：网络错误、超时、限流和服务端5xx"""
+
+    def __init__(self, message, retry_after=None, status=None):
+        super().__init__(message)
+        self.retry_after = retry_after  # 服务端要求的等待时间(秒)
+        self.status = status  # HTTP状态码，网络错误时为None
+
+class CircuitOpenError(Exception):
+    """提供商处于熔断状态，请求未发出"""
+
+class RejectedError(Exception):
+    """服务端拒绝请求的4xx错误（不可重试），保留状态码供调用方判断原因"""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+def parse_retry_after(headers):
+    """解析Retry-After响应头（秒数或HTTP日期），无法解析时返回None"""
+    value = headers.get("retry-after") if headers else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def check_response(response, message):
+    """非200响应转换为异常，可重试的状态码转换为TransientError"""
+    if response.status_code == 200:
+        return
+    error = f"{message} (状态码: {response.status_code}): {response.text}"
+    if response.status_code in RETRY_STATUS:
+        raise TransientError(error, parse_retry_after(response.headers), response.status_code)
+    if 400 <= response.status_code < 500:
+        raise RejectedError(error, response.status_code)
+    raise Exception(error)
+
+def wrap_error(error, message):
+    """给异常加上说明前缀，保留是否可重试的信息"""
+    text = f"{message}: {str(error)}"
+    if isinstance(error, TransientError):
+        return TransientError(text, error.retry_after, error.status)
+    if isinstance(error, CircuitOpenError):
+        return CircuitOpenError(text)
+    if isinstance(error, RejectedError):
+        return RejectedError(text, error.status)
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, httpx.TransportError,
+                          openai.APIConnectionError)):
+        return TransientError(text)
+    if isinstance(error, openai.APIStatusError) and error.status_code in RETRY_STATUS:
+        return TransientError(text, parse_retry_after(error.response.headers), error.status_code)
+    if isinstance(error, openai.APIStatusError) and 400 <= error.status_code < 500:
+        return RejectedError(text, error.status_code)
+    return Exception(text)
+
+class CircuitBreaker:
+    """连续失败达到阈值后熔断，冷却期内直接拒绝请求，冷却结束后放行一次试探请求"""
+
+    def __init__(self, failure_threshold, cooldown):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        """是否处于熔断冷却期"""
+        with self._lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self._probing:
+                return False
+            # 冷却结束，只放行一个试探请求
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        """记录一次失败，返回是否因此进入熔断"""
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None and not self._probing:
+                return False  # 熔断前已发出的请求失败，不延长冷却期
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._probing = False
+                return True
+            return False
+
+class ResilienceLayer:
+    """转写和后处理共用的容错层：带抖动的指数退避重试、遵守Retry-After、按提供商熔断"""
+
+    def __init__(self, config_manager):
+        self.config = config_manager
+        self.logger = Logger(config_manager)
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, key):
+        settings = self.config.config["general_settings"]
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(settings["breaker_failures"], settings["breaker_cooldown"])
+                self._breakers[key] = breaker
+            breaker.failure_threshold = settings["breaker_failures"]
+            breaker.cooldown = settings["breaker_cooldown"]
+            return breaker
+
+    def is_available(self, key):
+        """提供商当前是否未被熔断"""
+        return not self.breaker(key).is_open()
+
+    def backoff(self, attempt):
+        """第attempt次重试前的等待时间：指数增长，全抖动"""
+        settings = self.config.config["general_settings"]
+        cap = min(settings["retry_base_delay"] * (2 ** attempt), settings["retry_max_delay"])
+        return random.uniform(0, cap)
+
+    def call(self, key, func, deadline=None):
+        """调用func，临时错误时重试
+
+        deadline为整个调用（含重试和等待）的时间上限(秒)，超出时不再重试。
+        只有临时错误计入熔断，参数错误、鉴权失败等直接抛出。
+        """
+        breaker = self.breaker(key)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{key} 连续失败，暂停请求{breaker.cooldown:.0f}秒")
+        max_retries = self.config.config["general_settings"]["max_retries"]
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                result = func()
+            except TransientError as e:
+                if breaker.record_failure():
+                    self.logger.warning(f"{key} 连续失败{breaker.failures}次，熔断{breaker.cooldown:.0f}秒")
+                    raise
+                delay = e.retry_after if e.retry_after is not None else self.backoff(attempt)
+                elapsed = time.monotonic() - start
+                if attempt >= max_retries or (deadline is not None and elapsed + delay > deadline):
+                    raise
+                attempt += 1
+                self.logger.warning(f"{key} 请求失败，{delay:.2f}秒后第{attempt}次重试: {str(e)}")
+                time.sleep(delay)
+                continue
+            except Exception:
+                # 非临时错误说明服务可达，不影响熔断计数
+                breaker.record_success()
+                raise
+            breaker.record_success()
+            return result
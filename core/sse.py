@@ -0,0 +1,27 @@
+def iter_lines(chunks):
+    """把按到达顺序产出的字节块拆分为文本行（不含换行符）"""
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode("utf-8")
+    if buffer:
+        yield buffer.rstrip(b"\r").decode("utf-8")
+
+def iter_sse_data(chunks):
+    """解析服务端推送事件(SSE)流，逐个产出事件的data内容，多行data以换行连接"""
+    data = []
+    for line in iter_lines(chunks):
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+            continue
+        if line.startswith(":"):
+            continue  # 注释行，常用作心跳
+        field, _, value = line.partition(":")
+        if field == "data":
+            data.append(value[1:] if value.startswith(" ") else value)
+    if data:
+        yield "\n".join(data)
@@ -0,0 +1,95 @@
+import threading
+import time
+import uuid
+from .wav_utils import build_wav_header
+
+# 流式WAV的数据长度未知，按惯例填最大值，服务端读到流结束为止
+STREAMING_DATA_SIZE = 0xFFFFFFFF - 36
+
+class StreamingUpload:
+    """边录边传：录音开始时就打开multipart请求，以分块传输编码发送音频
+
+    请求体由生成器产生，依次输出表单字段、WAV文件头和录音数据块，
+    松开按键后补上结尾边界完成请求，此时服务端已收到几乎全部音频。
+    """
+
+    POLL_INTERVAL = 0.05  # 等待新音频数据的间隔(秒)
+
+    def __init__(self, logger, session, url, fields, reader, timeout):
+        self.logger = logger  # 使用管理器的日志对象，每次新建Logger会清空日志文件
+        self.session = session
+        self.url = url
+        self.fields = fields
+        self.reader = reader
+        self.timeout = timeout
+        self.boundary = uuid.uuid4().hex
+        self.bytes_sent = 0
+        self._response = None
+        self._error = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def abort(self):
+        """取消上传（录音太短或没有语音时）"""
+        self.reader.abort()
+
+    def finish(self):
+        """等待服务端返回，返回转写文本"""
+        self._done.wait()
+        if self._error:
+            raise self._error
+        response = self._response
+        if response.status_code != 200:
+            raise Exception(f"流式上传失败 (状态码: {response.status_code}): {response.text}")
+        try:
+            return response.json()["text"]
+        except (KeyError, ValueError):
+            raise Exception(f"API响应格式错误: {response.text}")
+
+    def _body(self):
+        """生成multipart请求体"""
+        for name, value in self.fields.items():
+            yield (
+                f"--{self.boundary}\r\n"
+                f"Content-Disposition: form-data; name=\"{name}\"\r\n\r\n"
+                f"{value}\r\n"
+            ).encode("utf-8")
+        yield (
+            f"--{self.boundary}\r\n"
+            f"Content-Disposition: form-data; name=\"file\"; filename=\"audio.wav\"\r\n"
+            f"Content-Type: audio/wav\r\n\r\n"
+        ).encode("utf-8")
+        yield build_wav_header(STREAMING_DATA_SIZE, self.reader.sample_rate, self.reader.channels)
+        while True:
+            samples = self.reader.read_available()
+            if samples is not None:
+                chunk = memoryview(samples).cast('B')
+                self.bytes_sent += chunk.nbytes
+                yield chunk
+            elif self.reader.aborted:
+                raise Exception("录音已取消，终止上传")
+            elif self.reader.finished:
+                break
+            else:
+                time.sleep(self.POLL_INTERVAL)
+        yield f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+
+    def _run(self):
+        try:
+            self._response = self.session.post(
+                self.url,
+                data=self._body(),
+                headers={"Content-Type": f"multipart/form-data; boundary={self.boundary}"},
+                timeout=self.timeout
+            )
+            self.logger.info(f"流式上传完成: 发送{self.bytes_sent}字节音频")
+        except Exception as e:
+            if not self.reader.aborted:
+                self.logger.error(f"流式上传失败: {str(e)}")
+            self._error = e
+        finally:
+            self._done.set()
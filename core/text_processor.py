@@ -1,18 +1,86 @@
-import openai
-import requests
+from .http_client import HttpClientPool
+from .resilience import ResilienceLayer, check_response, wrap_error
+from .ttl_cache import TTLCache
+from .sse import iter_sse_data
+import json
+from .logger import Logger
 
 class TextProcessor:
-    def __init__(self, config_manager):
+    def __init__(self, config_manager, http_pool=None, resilience=None):
         self.config = config_manager
+        self.http_pool = http_pool or HttpClientPool(config_manager)
+        self.resilience = resilience or ResilienceLayer(config_manager)
+        self.logger = Logger(config_manager)
+        settings = config_manager.config["transcription_settings"]
+        # 相同的(提供商, 模型, 提示词, 文本)直接复用结果，并发的相同请求只发送一次
+        self.cache = TTLCache(settings["post_process_cache_size"], settings["post_process_cache_ttl"])
         
     def process(self, text):
-        provider = self.config.config["transcription_settings"]["post_process_provider"]
-        prompt = self.config.config["transcription_settings"]["post_process_prompt"]
+        settings = self.config.config["transcription_settings"]
+        provider = settings["post_process_provider"]
+        prompt = settings["post_process_prompt"]
         
         if provider == "openai":
-            return self._process_openai(text, prompt)
+            request = lambda: self._process_openai(text, prompt)
         elif provider == "groq":
-            return self._process_groq(text, prompt)
+            request = lambda: self._process_groq(text, prompt)
+        else:
+            return None
+        # 后处理与转写分开熔断，转写服务故障不影响后处理
+        deadline = 2 * sum(self.http_pool.timeout())
+        self.cache.max_entries = settings["post_process_cache_size"]
+        self.cache.ttl = settings["post_process_cache_ttl"]
+        key = (provider, self._model(provider), prompt, text)
+        result = self.cache.get_or_compute(
+            key, lambda: self.resilience.call(f"post_process:{provider}", request, deadline)
+        )
+        self.logger.debug(f"后处理缓存统计: {self.cache.stats}")
+        return result
+    
+    def process_stream(self, text):
+        """流式后处理：逐段产出模型输出的文本增量
+
+        连接建立并收到响应之前的错误按容错层重试，开始输出后中断则直接抛出。
+        缓存命中时一次产出全部结果，流结束后把完整结果写入缓存。
+        """
+        settings = self.config.config["transcription_settings"]
+        provider = settings["post_process_provider"]
+        prompt = settings["post_process_prompt"]
+        
+        if provider == "openai":
+            open_stream = lambda: self._stream_openai(text, prompt)
+        elif provider == "groq":
+            open_stream = lambda: self._stream_groq(text, prompt)
+        else:
+            return
+        key = (provider, self._model(provider), prompt, text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        deadline = 2 * sum(self.http_pool.timeout())
+        deltas = self.resilience.call(f"post_process:{provider}", open_stream, deadline)
+        parts = []
+        for delta in deltas:
+            parts.append(delta)
+            yield delta
+        self.cache.put(key, "".join(parts))
+    
+    def _model(self, provider):
+        return self.config.config["api_settings"]["post_process"][provider]["model"]
+            
+    def connection_targets(self):
+        """当前后处理提供商需要预热的连接，格式同HttpClientPool.prewarm"""
+        provider = self.config.config["transcription_settings"]["post_process_provider"]
+        if provider == "openai":
+            settings = self.config.config["api_settings"]["post_process"]["openai"]
+            if settings["api_key"]:
+                return [("openai", ("post_process", "openai"), settings["api_key"], settings["api_url"])]
+        elif provider == "groq":
+            settings = self.config.config["api_settings"]["transcription"]["groq"]
+            if settings["api_key"]:
+                return [("session", "groq", settings["api_key"], settings["api_url"])]
+        return []
             
     def _process_openai(self, text, prompt):
         """使用OpenAI进行后处理"""
@@ -24,10 +92,7 @@ class TextProcessor:
         if not api_key:
             raise Exception("请先配置OpenAI后处理API密钥")
             
-        client = openai.OpenAI(
-            api_key=api_key,
-            base_url=api_url
-        )
+        client = self.http_pool.openai_client(("post_process", "openai"), api_key, api_url)
         
         try:
             response = client.chat.completions.create(
@@ -39,8 +104,79 @@ class TextProcessor:
             )
             return response.choices[0].message.content
         except Exception as e:
-            raise Exception(f"OpenAI后处理失败: {str(e)}")
+            raise wrap_error(e, "OpenAI后处理失败")
             
+    def _stream_openai(self, text, prompt):
+        """打开OpenAI流式对话，返回文本增量的迭代器"""
+        settings = self.config.config["api_settings"]["post_process"]["openai"]
+        if not settings["api_key"]:
+            raise Exception("请先配置OpenAI后处理API密钥")
+        client = self.http_pool.openai_client(("post_process", "openai"), settings["api_key"], settings["api_url"])
+        try:
+            stream = client.chat.completions.create(
+                model=settings["model"],
+                messages=[
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": text}
+                ],
+                stream=True
+            )
+        except Exception as e:
+            raise wrap_error(e, "OpenAI后处理失败")
+        return self._openai_deltas(stream)
+    
+    def _openai_deltas(self, stream):
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise wrap_error(e, "OpenAI后处理中断")
+        finally:
+            stream.close()
+    
+    def _stream_groq(self, text, prompt):
+        """打开Groq流式对话(SSE)，返回文本增量的迭代器"""
+        settings = self.config.config["api_settings"]["transcription"]["groq"]
+        if not settings["api_key"]:
+            raise Exception("请先配置Groq API密钥")
+        session = self.http_pool.session("groq", settings["api_key"])
+        json_data = {
+            "model": self._model("groq"),
+            "messages": [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": text}
+            ],
+            "stream": True
+        }
+        try:
+            response = session.post(
+                f"{settings['api_url']}/chat/completions",
+                json=json_data,
+                timeout=self.http_pool.timeout(),
+                stream=True
+            )
+            check_response(response, "Groq API错误")
+        except Exception as e:
+            raise wrap_error(e, "Groq后处理失败")
+        return self._sse_deltas(response)
+    
+    def _sse_deltas(self, response):
+        """从OpenAI兼容格式的SSE响应中取出文本增量"""
+        try:
+            # chunk_size=None时数据一到达就产出，不等待凑满缓冲区
+            for data in iter_sse_data(response.iter_content(chunk_size=None)):
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+        except Exception as e:
+            raise wrap_error(e, "Groq后处理中断")
+        finally:
+            response.close()
+    
     def _process_groq(self, text, prompt):
         """使用Groq进行后处理"""
         # 使用转录服务的Groq凭据
@@ -52,9 +188,8 @@ class TextProcessor:
         if not api_key:
             raise Exception("请先配置Groq API密钥")
             
-        headers = {
-            "Authorization": f"Bearer {api_key}"
-        }
+        # 与Groq转写共用同一个会话，复用到同一主机的连接
+        session = self.http_pool.session("groq", api_key)
         
         json_data = {
             "model": model,
@@ -64,13 +199,13 @@ class TextProcessor:
             ]
         }
         
-        response = requests.post(
-            f"{api_url}/chat/completions",
-            headers=headers,
-            json=json_data
-        )
-        
-        if response.status_code == 200:
+        try:
+            response = session.post(
+                f"{api_url}/chat/completions",
+                json=json_data,
+                timeout=self.http_pool.timeout()
+            )
+            check_response(response, "Groq API错误")
             return response.json()["choices"][0]["message"]["content"]
-        else:
-            raise Exception(f"Groq后处理失败: {response.text}")
+        except Exception as e:
+            raise wrap_error(e, "Groq后处理失败")
@@ -0,0 +1,68 @@
+import json
+import os
+
+def parse_transcript_event(data):
+    """解析流式转写的一条事件，返回(类型, 文本)，与文本无关的事件返回None
+
+    类型：
+    - delta: 追加的文本增量（OpenAI的transcript.text.delta）
+    - final: 完整的最终结果（OpenAI的transcript.text.done）
+    - partial: 当前片段的临时结果（is_final为false），后续事件可能修改
+    - segment: 已确定的一个片段（自建Whisper服务逐段返回的{"text": ...}）
+    """
+    event = json.loads(data)
+    if not isinstance(event, dict):
+        return None
+    if "error" in event:
+        raise Exception(f"转写服务返回错误: {event['error']}")
+    event_type = event.get("type", "")
+    if "delta" in event:
+        return "delta", event["delta"]
+    if "text" not in event:
+        return None
+    if event_type.endswith(".done") or event_type == "final":
+        return "final", event["text"]
+    if event.get("is_final") is False or "partial" in event_type:
+        return "partial", event["text"]
+    return "segment", event["text"]
+
+class TranscriptStabilizer:
+    """把流式转写事件整理为只增不改的稳定文本
+
+    增量和已确定的片段直接视为稳定；临时结果只有连续两次一致的开头部分才算稳定。
+    已交给插入的文本如果被后续事件修改，不再产出增量，由最终结果就地修正。
+    """
+
+    def __init__(self):
+        self.committed = ""  # 已确定的文本
+        self.hypothesis = ""  # 当前片段的临时结果
+        self.emitted = ""  # 已产出的稳定文本
+        self.final = None
+
+    @property
+    def text(self):
+        """目前为止的完整转写结果"""
+        if self.final is not None:
+            return self.final
+        return self.committed + self.hypothesis
+
+    def update(self, kind, text):
+        """处理一条事件，返回新增的稳定文本"""
+        if kind == "delta":
+            self.committed += text
+            stable = self.committed
+        elif kind == "segment":
+            self.committed += text
+            self.hypothesis = ""
+            stable = self.committed
+        elif kind == "partial":
+            stable = self.committed + os.path.commonprefix([self.hypothesis, text])
+            self.hypothesis = text
+        else:
+            self.final = text
+            stable = text
+        if len(stable) > len(self.emitted) and stable.startswith(self.emitted):
+            delta = stable[len(self.emitted):]
+            self.emitted = stable
+            return delta
+        return ""
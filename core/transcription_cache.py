@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from .wav_utils import parse_wav
+from .logger import Logger
+
+class TranscriptionCache:
+    """按音频内容寻址的转写结果缓存
+
+    键为规范化PCM样本（忽略WAV文件头差异）与提供商、模型、语言和文本处理设置的哈希，
+    值为最终文本。内存中按LRU淘汰，可选的磁盘层按总大小上限淘汰最久未用的条目。
+    同一段录音重新提交、插入失败后重试时直接返回结果，无需再次请求服务。
+    """
+
+    CACHE_DIR = os.path.join("cache", "transcriptions")
+
+    def __init__(self, config_manager):
+        self.config = config_manager
+        self.logger = Logger(config_manager)
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> 文本
+        self.last_key = None  # 最近一次听写的键，用于重新插入
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _settings(self):
+        return self.config.config["cache_settings"]
+
+    def _context(self):
+        """影响转写结果的设置"""
+        config = self.config.config
+        trans = config["transcription_settings"]
+        provider = trans["provider"]
+        providers = config["api_settings"]["transcription"]
+        models = sorted((name, settings["model"]) for name, settings in providers.items()
+                        if provider in ("auto", name))
+        post_models = (
+            config["api_settings"]["post_process"][trans["post_process_provider"]]["model"]
+            if trans["post_process"] else None
+        )
+        return json.dumps([
+            provider, models, "zh",
+            trans["remove_emoji"], trans["remove_punctuation"], trans["punctuation_to_remove"],
+            trans["post_process"], trans["post_process_provider"], post_models, trans["post_process_prompt"]
+        ], ensure_ascii=False)
+
+    def key(self, audio_data):
+        """计算录音的缓存键，缓存未启用时返回None"""
+        if not self._settings()["enabled"]:
+            return None
+        pcm, sample_rate, channels = parse_wav(audio_data)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{sample_rate}:{channels}:".encode())
+        digest.update(memoryview(np.ascontiguousarray(pcm)).cast('B'))
+        digest.update(self._context().encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """查找缓存，未命中时返回None"""
+        if key is None:
+            return None
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+        if text is None:
+            text = self._read_disk(key)
+            with self._lock:
+                if text is not None:
+                    self.stats["disk_hits"] += 1
+                    self._remember(key, text)
+                else:
+                    self.stats["misses"] += 1
+        self.last_key = key if text is not None else self.last_key
+        self._log_stats("命中" if text is not None else "未命中")
+        return text
+
+    def put(self, key, text):
+        if key is None or text is None:
+            return
+        with self._lock:
+            self._remember(key, text)
+        self.last_key = key
+        if self._settings()["disk_enabled"]:
+            self._write_disk(key, text)
+
+    def last(self):
+        """最近一次听写的文本（不需要网络）"""
+        key = self.last_key
+        if key is None:
+            return None
+        with self._lock:
+            text = self._memory.get(key)
+        return text if text is not None else self._read_disk(key)
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._settings()["max_entries"]:
+            self._memory.popitem(last=False)
+
+    def _log_stats(self, result):
+        stats = self.stats
+        total = sum(stats.values())
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        self.logger.info(
+            f"转写缓存{result}: 命中率{hits / total:.0%} "
+            f"(内存{stats['memory_hits']}, 磁盘{stats['disk_hits']}, 未命中{stats['misses']})"
+        )
+
+    def _path(self, key):
+        return os.path.join(self.CACHE_DIR, f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self._settings()["disk_enabled"]:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = json.load(f)["text"]
+            os.utime(path)  # 更新访问时间，淘汰时按最久未用
+            return text
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, text):
+        try:
+            os.makedirs(self.CACHE_DIR, exist_ok=True)
+            with open(self._path(key), 'w', encoding='utf-8') as f:
+                json.dump({"text": text, "created": time.time()}, f, ensure_ascii=False)
+            self._evict_disk()
+        except OSError as e:
+            self.logger.warning(f"写入磁盘缓存失败: {str(e)}")
+
+    def _evict_disk(self):
+        """磁盘缓存超过大小上限时删除最久未用的条目"""
+        limit = self._settings()["disk_max_mb"] * 1024 * 1024
+        entries = []
+        for entry in os.scandir(self.CACHE_DIR):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            os.remove(path)
+            total -= size
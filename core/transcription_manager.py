@@ -1,19 +1,60 @@
-import openai
-import requests
 import pyautogui
 import pyperclip
 from .text_processor import TextProcessor
+from .audio_encoder import AudioEncoder
+from .http_client import HttpClientPool
+from .resilience import ResilienceLayer, TransientError, CircuitOpenError, RejectedError, check_response, wrap_error
+from .streaming_upload import StreamingUpload
+from .live_segmenter import LiveSegmenter
+from .audio_splitter import AudioSplitter, merge_overlapping
+from .latency_tracker import LatencyTracker
+from .rate_limiter import RateLimiter
+from .transcription_cache import TranscriptionCache
+from .transcript_stream import parse_transcript_event, TranscriptStabilizer
+from .sse import iter_lines, iter_sse_data
+from .wav_utils import wav_duration, pcm_to_wav
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import threading
 from .logger import Logger
 import time
+import httpx
 import win32com.client
+import win32gui
 import pythoncom
 import re
 import emoji
+import numpy as np
 
 class TranscriptionManager:
+    PROVIDERS = ("openai", "groq", "custom")
+    PROBE_CHECK_INTERVAL = 10.0  # 后台探测检查间隔(秒)
+    
     def __init__(self, config_manager):
         self.config = config_manager
-        self.text_processor = TextProcessor(config_manager)
+        # 长连接池在转写和后处理之间共享
+        self.http_pool = HttpClientPool(config_manager)
+        self.resilience = ResilienceLayer(config_manager)
+        self.rate_limiter = RateLimiter(config_manager)
+        self.cache = TranscriptionCache(config_manager)
+        self.text_processor = TextProcessor(config_manager, self.http_pool, self.resilience)
+        self.encoder = AudioEncoder(config_manager)
+        self.splitter = AudioSplitter(config_manager)
+        # 分段转写请求在独立线程池中执行，不占用听写任务的线程；
+        # 每个提供商的并发数另由信号量限制
+        self.segment_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="segment")
+        self._segment_limits = {}  # 提供商 -> (并发上限, 信号量)
+        self._segment_lock = threading.Lock()
+        # 对冲请求：主提供商超出延迟期限后同时请求备用提供商
+        self.latency = LatencyTracker()
+        self.hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+        self.hedge_stats = {"requests": 0, "hedged": 0, "secondary_wins": 0}
+        self._hedge_lock = threading.Lock()
+        # auto模式下的后台延迟探测
+        self._closing = threading.Event()
+        self._probe_clip = None
+        self._explored = {}  # 提供商 -> 最近一次把录音分配给它来测量耗时的时间
+        self._explore_lock = threading.Lock()
+        threading.Thread(target=self._probe_loop, daemon=True, name="latency-probe").start()
         self.logger = Logger(config_manager)  # 传入 config_manager
         # 设置pyautogui的安全设置
         pyautogui.PAUSE = 0.01  # 设置操作间隔时间
@@ -26,24 +67,511 @@ class TranscriptionManager:
             self.logger.error(f"COM初始化失败: {str(e)}")
             self.shell = None
             
-    def transcribe(self, audio_data):
-        provider = self.config.config["transcription_settings"]["provider"]
-        self.logger.info(f"使用 {provider} 进行转写")
+    def current_provider(self):
+        """当前设置的转写提供商，可能为auto"""
+        return self.config.config["transcription_settings"]["provider"]
+    
+    def resolve_provider(self, provider, audio_data):
+        """provider为auto时按录音时长选择实际使用的提供商"""
+        if provider != "auto":
+            return provider
+        return self.choose_provider(wav_duration(audio_data))
+    
+    def choose_provider(self, audio_seconds):
+        """选择预计转写最快的可用提供商
+
+        按各提供商/模型的近期耗时预估该时长音频的耗时，熔断中的提供商不参与。
+        没有耗时样本或样本已超过probe_interval的提供商先分配一次录音来测量，
+        每个提供商每probe_interval最多一次，之后按预估耗时选择。
+        """
+        candidates = [provider for provider in self.PROVIDERS if self._provider_configured(provider)]
+        if not candidates:
+            raise Exception("自动选择提供商失败: 请先在设置中配置至少一个转写提供商")
+        healthy = [provider for provider in candidates if self.resilience.is_available(provider)] or candidates
+        interval = self.config.config["transcription_settings"]["probe_interval"]
+        with self._explore_lock:
+            now = time.monotonic()
+            for provider in healthy:
+                explored = self._explored.get(provider)
+                if self._measured_recently(provider, interval) or (explored is not None and now - explored < interval):
+                    continue
+                self._explored[provider] = now
+                self.logger.info(f"自动选择提供商: {provider}（没有近期耗时统计，用本次录音测量）")
+                return provider
+        estimates = {}
+        for provider in healthy:
+            estimate = self.latency.estimate(self._latency_key(provider), audio_seconds)
+            if estimate is not None:
+                estimates[provider] = estimate
+        if not estimates:
+            self.logger.info(f"自动选择提供商: {healthy[0]}（暂无耗时统计）")
+            return healthy[0]
+        choice = min(estimates, key=estimates.get)
+        summary = ", ".join(f"{provider}={estimate:.2f}秒" for provider, estimate in estimates.items())
+        self.logger.info(f"自动选择提供商: {choice}（{audio_seconds:.1f}秒音频，预计耗时 {summary}）")
+        return choice
+    
+    def _measured_recently(self, provider, interval):
+        """提供商在interval秒内是否有耗时样本"""
+        last = self.latency.last_recorded(self._latency_key(provider))
+        return last is not None and time.monotonic() - last < interval
+    
+    def _latency_key(self, provider):
+        """耗时统计按提供商和模型区分"""
+        settings = self.config.config["api_settings"]["transcription"].get(provider, {})
+        return (provider, settings.get("model", ""))
+    
+    def encode_audio(self, audio_data, provider):
+        """编码阶段：按提供商设置编码上传音频，返回(文件名, 数据, MIME类型)"""
+        return self.encoder.encode(audio_data, provider)
+    
+    FORMAT_REJECT_STATUS = (400, 415)  # 服务端不接受上传格式时常见的状态码
+    
+    def _send_with_wav_fallback(self, audio_data, audio_file, provider, send):
+        """调用send(audio_file)上传，服务端拒绝编码后的格式时改用WAV重新上传一次
         
-        text = None
-        if provider == "openai":
-            text = self._transcribe_openai(audio_data)
+        WAV上传成功说明确实是格式问题，本次运行中该提供商之后直接上传WAV。
+        """
+        try:
+            return send(audio_file)
+        except RejectedError as e:
+            if audio_file[2] == "audio/wav" or e.status not in self.FORMAT_REJECT_STATUS:
+                raise
+            self.logger.warning(f"{provider} 拒绝了{audio_file[0]}，改用WAV重新上传: {str(e)}")
+        result = send(self.encoder.wav_file(audio_data))
+        self.encoder.reject(provider)
+        return result
+    
+    def request_transcription(self, audio_file, provider, audio_seconds=None):
+        """上传阶段：调用提供商接口，返回原始转写文本
+
+        读取超时按音频时长计算，临时错误按设置重试，连续失败时熔断该提供商。
+        """
+        self.logger.info(f"使用 {provider} 进行转写")
+        if self.stream_response_enabled(provider):
+            # 服务端流式返回时读完整个流得到最终结果
+            transcribe = lambda audio_file, timeout, api_key: self._collect_transcript(
+                self._open_transcript_stream(provider, audio_file, timeout, api_key)
+            )
+        elif provider == "openai":
+            transcribe = self._transcribe_openai
         elif provider == "groq":
-            text = self._transcribe_groq(audio_data)
+            transcribe = self._transcribe_groq
         elif provider == "custom":
-            text = self._transcribe_custom(audio_data)
-            
-        # 添加到历史记录
-        if text:
-            self.config.add_history(text)
-            
+            transcribe = self._transcribe_custom
+        else:
+            raise Exception(f"未知的转写提供商: {provider}")
+        return self._call_provider(provider, transcribe, audio_file, audio_seconds)
+    
+    def open_transcription_stream(self, audio_data, provider, audio_file):
+        """发起流式转写请求，返回转写事件(类型, 文本)的迭代器
+        
+        收到响应之前的错误按设置重试，开始接收事件后中断则直接抛出。
+        读取速度取决于调用方（等待插入顺序、边读边插入），耗时不代表服务的速度，不计入耗时统计。
+        """
+        self.logger.info(f"使用 {provider} 进行流式转写")
+        audio_seconds = wav_duration(audio_data)
+        return self._send_with_wav_fallback(
+            audio_data, audio_file, provider,
+            lambda audio_file: self._call_provider(
+                provider,
+                lambda audio_file, timeout, api_key: self._open_transcript_stream(provider, audio_file, timeout, api_key),
+                audio_file, audio_seconds
+            )
+        )
+    
+    def _call_provider(self, provider, transcribe, audio_file, audio_seconds):
+        """经过限流和容错层调用transcribe(audio_file, timeout, api_key)"""
+        timeout = self.http_pool.timeout(audio_seconds)
+        keys = self.api_keys(provider)
+        
+        def attempt():
+            # 每次尝试（含重试）都经过限流，按策略选择API密钥。
+            # 某个密钥被服务端限流(429)时暂停该密钥，还有其他可用密钥就在此立即换用，
+            # 换密钥不算失败重试，也不计入熔断；所有密钥都被限流时才交给容错层退避重试
+            for _ in range(max(len(keys), 1)):
+                api_key = self.rate_limiter.acquire(provider, keys, audio_seconds or 0.0) if keys else ""
+                try:
+                    return transcribe(audio_file, timeout, api_key)
+                except TransientError as e:
+                    if e.status != 429 or not self.rate_limiter.penalize(provider, api_key, keys, e.retry_after):
+                        raise
+                    error = e
+                    self.logger.info(f"{provider} 密钥被限流，换用其他密钥")
+            raise error
+        
+        # 含重试在内的总期限为单次请求超时的两倍
+        deadline = 2 * sum(timeout)
+        return self.resilience.call(provider, attempt, deadline)
+    
+    STREAM_RESPONSE_PROVIDERS = ("openai", "custom")  # 可流式返回转写结果的服务，Groq不支持
+    
+    def stream_response_enabled(self, provider):
+        """提供商是否启用了流式返回转写结果"""
+        settings = self.config.config["api_settings"]["transcription"].get(provider, {})
+        return provider in self.STREAM_RESPONSE_PROVIDERS and settings.get("stream_response", False)
+    
+    def partial_insertion_enabled(self, provider):
+        """转写结果是否边接收边插入：需要流式返回，且后处理不必等完整文本（未启用或就地修正模式）"""
+        if not self.stream_response_enabled(provider):
+            return False
+        return not self.config.config["transcription_settings"]["post_process"] or self.optimistic_post_process_enabled()
+    
+    def _open_transcript_stream(self, provider, audio_file, timeout, api_key):
+        """上传音频并请求流式返回，返回转写事件的迭代器"""
+        settings = self.config.config["api_settings"]["transcription"][provider]
+        api_url = settings["api_url"]
+        model = settings["model"]
+        
+        if not api_url:
+            raise Exception(f"请先在设置中配置{provider} API URL")
+        if not api_key:
+            raise Exception(f"请先在设置中配置{provider} API密钥")
+        
+        if provider == "openai":
+            url = f"{api_url}/audio/transcriptions"
+            files = {'file': audio_file}
+            data = {'model': model, 'language': 'zh', 'stream': 'true'}
+        else:
+            url = api_url
+            files = {'file': audio_file, 'model': (None, model), 'stream': (None, 'true')}
+            data = None
+        try:
+            session = self.http_pool.session(provider, settings["api_key"])
+            response = session.post(
+                url,
+                files=files,
+                data=data,
+                headers={"Authorization": f"Bearer {api_key}"},
+                timeout=timeout,
+                stream=True
+            )
+            check_response(response, "API请求失败")
+        except Exception as e:
+            raise wrap_error(e, f"{provider}流式转写失败")
+        return self._transcript_events(provider, response)
+    
+    def _transcript_events(self, provider, response):
+        """从SSE或JSON行格式的响应中逐个取出转写事件"""
+        try:
+            content_type = response.headers.get("Content-Type", "")
+            if content_type.startswith("application/json"):
+                # 服务端忽略了stream参数，直接返回完整结果
+                yield "final", response.json()["text"]
+                return
+            # chunk_size=None时数据一到达就产出，不等待凑满缓冲区
+            chunks = response.iter_content(chunk_size=None)
+            lines = iter_sse_data(chunks) if content_type.startswith("text/event-stream") else iter_lines(chunks)
+            for data in lines:
+                if data == "[DONE]":
+                    break
+                event = parse_transcript_event(data) if data.strip() else None
+                if event:
+                    yield event
+        except Exception as e:
+            raise wrap_error(e, f"{provider}流式转写中断")
+        finally:
+            response.close()
+    
+    def _collect_transcript(self, events):
+        """读完转写事件流，返回最终文本"""
+        stabilizer = TranscriptStabilizer()
+        for kind, text in events:
+            stabilizer.update(kind, text)
+        self.logger.info("转写成功")
+        self.logger.debug(f"原始转写结果: {stabilizer.text}")
+        return stabilizer.text
+    
+    def api_keys(self, provider):
+        """提供商的全部API密钥：主密钥加上api_keys中的额外密钥"""
+        settings = self.config.config["api_settings"]["transcription"].get(provider, {})
+        keys = [settings.get("api_key", "")] + list(settings.get("api_keys", []))
+        return list(dict.fromkeys(key.strip() for key in keys if key and key.strip()))
+    
+    def split_audio(self, audio_data, provider):
+        """长录音按提供商的分段设置切分为带重叠的片段，短录音原样返回单个片段"""
+        settings = self.config.config["api_settings"]["transcription"].get(provider, {})
+        segment_time = settings.get("segment_time", 0)
+        if segment_time <= 0:
+            return [audio_data]
+        overlap = self.config.config["transcription_settings"]["segment_overlap"]
+        segments = self.splitter.split(audio_data, segment_time, overlap)
+        if len(segments) > 1:
+            self.logger.info(f"长录音切分为{len(segments)}段并行转写")
+        return segments
+    
+    def transcribe_segments(self, segments, provider):
+        """并行转写各片段，按顺序合并并去除重叠部分的重复文本"""
+        futures = [self.submit_segment(segment, provider) for segment in segments]
+        try:
+            texts = [future.result() for future in futures]
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        return merge_overlapping(texts)
+    
+    def submit_segment(self, audio_data, provider):
+        """在分段线程池中编码并转写一个片段，返回Future"""
+        return self.segment_pool.submit(self._transcribe_segment, audio_data, provider)
+    
+    def _segment_limit(self, provider):
+        """提供商的分段并发信号量，并发上限设置变化时重建"""
+        settings = self.config.config["api_settings"]["transcription"].get(provider, {})
+        limit = max(int(settings.get("max_concurrency", 2)), 1)
+        with self._segment_lock:
+            cached = self._segment_limits.get(provider)
+            if not cached or cached[0] != limit:
+                cached = (limit, threading.BoundedSemaphore(limit))
+                self._segment_limits[provider] = cached
+            return cached[1]
+    
+    def _transcribe_segment(self, audio_data, provider):
+        provider = self.resolve_provider(provider, audio_data)
+        with self._segment_limit(provider):
+            return self.transcribe_audio(audio_data, provider)
+    
+    def transcribe_audio(self, audio_data, provider, audio_file=None):
+        """编码并转写一段音频，返回原始文本
+
+        audio_file为已编码好的主提供商上传文件，省略时在此编码。
+        启用故障转移时，提供商熔断或重试后仍失败则改用备用提供商。
+        """
+        fallback = self._failover_provider(provider)
+        if fallback and not self.resilience.is_available(provider):
+            self.logger.warning(f"{provider} 熔断中，改用 {fallback} 转写")
+            return self._transcribe_on(audio_data, fallback)
+        try:
+            return self._transcribe_on(audio_data, provider, audio_file)
+        except (TransientError, CircuitOpenError) as e:
+            if not fallback:
+                raise
+            self.logger.warning(f"{provider} 转写失败，改用 {fallback}: {str(e)}")
+            return self._transcribe_on(audio_data, fallback)
+    
+    def _failover_provider(self, provider):
+        """故障转移使用的备用提供商，未启用或未配置时返回None"""
+        settings = self.config.config["transcription_settings"]
+        if not settings["failover_enabled"]:
+            return None
+        fallback = settings["failover_provider"]
+        if fallback == provider or not self._provider_configured(fallback):
+            return None
+        return fallback
+    
+    def _provider_configured(self, provider):
+        settings = self.config.config["api_settings"]["transcription"].get(provider, {})
+        return bool(settings.get("api_key") and settings.get("api_url"))
+    
+    def _transcribe_on(self, audio_data, provider, audio_file=None):
+        """在指定提供商上转写，启用对冲时主提供商超出延迟期限未返回则同时请求备用提供商"""
+        secondary = self._hedge_provider(provider)
+        if not secondary:
+            return self._timed_transcription(audio_data, provider, audio_file)
+        return self._transcribe_hedged(audio_data, provider, secondary, audio_file)
+    
+    def _timed_transcription(self, audio_data, provider, audio_file=None):
+        """转写并记录耗时"""
+        if audio_file is None:
+            audio_file = self.encode_audio(audio_data, provider)
+        audio_seconds = wav_duration(audio_data)
+        start = time.perf_counter()
+        text = self._send_with_wav_fallback(
+            audio_data, audio_file, provider,
+            lambda audio_file: self.request_transcription(audio_file, provider, audio_seconds)
+        )
+        latency = time.perf_counter() - start
+        self.latency.record(self._latency_key(provider), latency, audio_seconds)
+        self.logger.debug(f"{provider} 转写耗时{latency:.2f}秒")
         return text
     
+    def _hedge_provider(self, provider):
+        """对冲使用的备用提供商，未启用或未配置时返回None"""
+        settings = self.config.config["transcription_settings"]
+        if not settings["hedge_enabled"]:
+            return None
+        secondary = settings["hedge_provider"]
+        if secondary == provider or not self._provider_configured(secondary):
+            return None
+        return secondary
+    
+    def _hedge_deadline(self, provider, audio_seconds):
+        """主提供商的延迟期限：按音频时长缩放的历史耗时百分位，样本不足时用固定延迟"""
+        settings = self.config.config["transcription_settings"]
+        per_second = self.latency.percentile(self._latency_key(provider), settings["hedge_percentile"])
+        if per_second is None:
+            return settings["hedge_delay"]
+        return max(per_second * max(audio_seconds, 1.0), settings["hedge_min_delay"])
+    
+    def _transcribe_hedged(self, audio_data, provider, secondary, audio_file=None):
+        deadline = self._hedge_deadline(provider, wav_duration(audio_data))
+        primary = self.hedge_pool.submit(self._timed_transcription, audio_data, provider, audio_file)
+        done, _ = wait([primary], timeout=deadline)
+        if done and primary.exception() is None:
+            self._count_hedge(False, False)
+            return primary.result()
+        
+        # 主提供商超时或已失败，同时请求备用提供商
+        reason = "失败" if done else f"{deadline:.2f}秒内未返回"
+        self.logger.info(f"{provider} {reason}，对冲请求 {secondary}")
+        backup = self.hedge_pool.submit(self._timed_transcription, audio_data, secondary)
+        pending = {primary: provider, backup: secondary}
+        errors = []
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                if future.exception() is None:
+                    # 落败的请求若已发出则无法中断，其结果被丢弃，耗时仍计入统计
+                    for other in pending:
+                        other.cancel()
+                    self._count_hedge(True, name == secondary)
+                    return future.result()
+                errors.append(f"{name}: {future.exception()}")
+        self._count_hedge(True, False)
+        raise Exception("对冲请求全部失败: " + "; ".join(errors))
+    
+    def _count_hedge(self, hedged, secondary_won):
+        """更新对冲统计，触发对冲时记录触发比例"""
+        with self._hedge_lock:
+            stats = self.hedge_stats
+            stats["requests"] += 1
+            stats["hedged"] += hedged
+            stats["secondary_wins"] += secondary_won
+            report = dict(stats)
+        if hedged:
+            self.logger.info(
+                f"对冲统计: 触发{report['hedged']}/{report['requests']}次"
+                f"({report['hedged'] / report['requests']:.0%})，备用胜出{report['secondary_wins']}次"
+            )
+    
+    def prepare_post_process(self, text):
+        """清理文本，返回(清理后的文本, 是否还需要大模型后处理)"""
+        raw = text
+        text = self._process_text(text)
+        self.logger.debug(f"处理后的结果: {text}")
+        if not text or not self.config.config["transcription_settings"]["post_process"]:
+            return text, False
+        if self._skip_post_process(raw, text):
+            self.logger.info(f"短文本无需修正，跳过后处理: {text}")
+            return text, False
+        return text, True
+    
+    def post_process(self, text):
+        """调用大模型后处理已清理的文本"""
+        self.logger.info("开始后处理")
+        text = self.text_processor.process(text).strip()
+        self.logger.debug(f"后处理结果: {text}")
+        return text
+    
+    def optimistic_post_process_enabled(self):
+        """是否先插入清理后的转写文本，后处理完成后再就地修正"""
+        return self.config.config["transcription_settings"].get("post_process_optimistic", False)
+    
+    def streaming_post_process_enabled(self):
+        """后处理结果是否边生成边插入"""
+        return self.config.config["transcription_settings"].get("post_process_streaming", False)
+    
+    def _skip_post_process(self, raw, cleaned):
+        """不超过设定长度、且清理前后没有变化的短文本不必交给大模型"""
+        max_length = self.config.config["transcription_settings"]["post_process_bypass_length"]
+        return 0 < len(cleaned) <= max_length and cleaned == raw.strip()
+    
+    def record_history(self, text, capture_health=None):
+        """添加到历史记录"""
+        if text:
+            self.config.add_history(text, capture_health)
+    
+    STREAMING_PROVIDERS = ("openai", "custom")  # 兼容OpenAI格式、可接受分块上传的服务
+    
+    def streaming_upload_enabled(self, provider=None):
+        """当前提供商是否启用了边录边传"""
+        provider = provider or self.current_provider()
+        settings = self.config.config["api_settings"]["transcription"].get(provider, {})
+        return provider in self.STREAMING_PROVIDERS and settings.get("streaming_upload", False)
+    
+    def start_streaming_upload(self, reader):
+        """录音开始时打开流式上传请求，返回StreamingUpload，未启用时返回None"""
+        provider = self.current_provider()
+        if not self.streaming_upload_enabled(provider):
+            return None
+        settings = self.config.config["api_settings"]["transcription"][provider]
+        if not settings["api_key"] or not settings["api_url"]:
+            return None
+        if provider == "openai":
+            url = f"{settings['api_url']}/audio/transcriptions"
+            fields = {"model": settings["model"], "language": "zh"}
+        else:
+            url = settings["api_url"]
+            fields = {"model": settings["model"]}
+        self.logger.info(f"开始流式上传到 {provider}")
+        session = self.http_pool.session(provider, settings["api_key"])
+        return StreamingUpload(self.logger, session, url, fields, reader, self.http_pool.timeout()).start()
+    
+    def live_segmentation_enabled(self):
+        """是否在录音期间按停顿分段实时转写"""
+        return self.config.config["transcription_settings"]["live_segmentation"]
+    
+    def start_live_segmentation(self, reader):
+        """录音开始时启动分段转写，返回LiveSegmenter"""
+        provider = self.current_provider()
+        self.logger.info(f"开始分段实时转写: {provider}")
+        return LiveSegmenter(self, reader, provider).start()
+    
+    def close(self):
+        """退出时关闭线程池和网络连接"""
+        self._closing.set()
+        self.segment_pool.shutdown(wait=False, cancel_futures=True)
+        self.hedge_pool.shutdown(wait=False, cancel_futures=True)
+        self.http_pool.close()
+    
+    def prewarm_connections(self):
+        """按下热键时预热转写和后处理服务的连接，与录音过程并行"""
+        if not self.config.config["general_settings"]["prewarm_connections"]:
+            return
+        provider = self.current_provider()
+        # auto模式下录音结束前不知道会选哪个提供商，预热所有已配置的
+        providers = self.PROVIDERS if provider == "auto" else (provider,)
+        targets = []
+        for provider in providers:
+            settings = self.config.config["api_settings"]["transcription"].get(provider, {})
+            if not settings.get("api_key"):
+                continue
+            if provider == "openai":
+                targets.append(("openai", ("transcription", "openai"), settings["api_key"], settings["api_url"]))
+            else:
+                targets.append(("session", provider, settings["api_key"], settings["api_url"]))
+        if self.config.config["transcription_settings"]["post_process"]:
+            targets.extend(
+                target for target in self.text_processor.connection_targets()
+                if target[1] not in [t[1] for t in targets]
+            )
+        self.http_pool.prewarm(targets)
+    
+    def _probe_loop(self):
+        """auto模式下定期用短的合成音频测量长时间没有耗时样本的提供商"""
+        while not self._closing.wait(self.PROBE_CHECK_INTERVAL):
+            settings = self.config.config["transcription_settings"]
+            if settings["provider"] != "auto" or not settings["auto_probe"]:
+                continue
+            for provider in self.PROVIDERS:
+                if not self._provider_configured(provider) or not self.resilience.is_available(provider):
+                    continue
+                if self._measured_recently(provider, settings["probe_interval"]):
+                    continue
+                try:
+                    self._timed_transcription(self._get_probe_clip(), provider)
+                    self.logger.debug(f"延迟探测完成: {provider}")
+                except Exception as e:
+                    self.logger.debug(f"延迟探测失败: {provider} {str(e)}")
+    
+    def _get_probe_clip(self):
+        """0.5秒16kHz的低电平噪声"""
+        if self._probe_clip is None:
+            noise = np.random.default_rng(0).normal(0, 30, 8000).astype(np.int16)
+            self._probe_clip = pcm_to_wav(noise.reshape(-1, 1), 16000, 1)
+        return self._probe_clip
+    
     def _process_text(self, text):
         """处理转写后的文本"""
         # 移除表情符号
@@ -59,18 +587,11 @@ class TranscriptionManager:
             while text and text[-1] in punctuation:
                 text = text[:-1]
         
-        # 后处理
-        if self.config.config["transcription_settings"]["post_process"]:
-            self.logger.info("开始后处理")
-            text = self.text_processor.process(text)
-            self.logger.debug(f"后处理结果: {text}")
-        
         return text.strip()
     
-    def _transcribe_openai(self, audio_data):
+    def _transcribe_openai(self, audio_file, timeout, api_key):
         """使用OpenAI进行转写"""
         settings = self.config.config["api_settings"]["transcription"]["openai"]
-        api_key = settings["api_key"]
         api_url = settings["api_url"]
         model = settings["model"]
         
@@ -78,45 +599,34 @@ class TranscriptionManager:
             self.logger.error("OpenAI API密钥未配置")
             raise Exception("请先在设置中配置OpenAI API密钥")
             
-        client = openai.OpenAI(
-            api_key=api_key,
-            base_url=api_url
-        )
+        client = self.http_pool.openai_client(("transcription", "openai"), settings["api_key"], api_url)
+        if api_key != settings["api_key"]:
+            # 其他密钥复用同一个连接池
+            client = client.with_options(api_key=api_key)
         
         self.logger.debug(f"使用OpenAI API: {api_url}")
         self.logger.debug(f"使用模型: {model}")
         
-        with open("temp_audio.wav", "wb") as f:
-            f.write(audio_data)
-            
         try:
-            with open("temp_audio.wav", "rb") as f:
-                response = client.audio.transcriptions.create(
-                    model=model,
-                    file=f,
-                    language="zh"
-                )
-                text = response.text
-                self.logger.info("转写成功")
-                self.logger.debug(f"原始转写结果: {text}")
-                
-                # 处理文本
-                text = self._process_text(text)
-                self.logger.debug(f"处理后的结果: {text}")
-                
-                return text
+            # 直接从内存上传，OpenAI根据文件名的扩展名识别音频格式
+            response = client.audio.transcriptions.create(
+                model=model,
+                file=audio_file,
+                language="zh",
+                timeout=httpx.Timeout(timeout[1], connect=timeout[0])
+            )
+            text = response.text
+            self.logger.info("转写成功")
+            self.logger.debug(f"原始转写结果: {text}")
+            
+            return text
         except Exception as e:
             self.logger.error(f"OpenAI转写失败: {str(e)}")
-            raise Exception(f"OpenAI转写失败: {str(e)}")
-        finally:
-            import os
-            if os.path.exists("temp_audio.wav"):
-                os.remove("temp_audio.wav")
+            raise wrap_error(e, "OpenAI转写失败")
                 
-    def _transcribe_groq(self, audio_data):
+    def _transcribe_groq(self, audio_file, timeout, api_key):
         """使用Groq进行转写"""
         settings = self.config.config["api_settings"]["transcription"]["groq"]
-        api_key = settings["api_key"]
         api_url = settings["api_url"]  # Groq的API URL是固定的
         model = settings["model"]
         
@@ -127,58 +637,39 @@ class TranscriptionManager:
         self.logger.debug(f"使用Groq API: {api_url}")
         self.logger.debug(f"使用模型: {model}")
         
-        # 保存临时音频文件
-        with open("temp_audio.wav", "wb") as f:
-            f.write(audio_data)
-        
         try:
-            headers = {
-                "Authorization": f"Bearer {api_key}"
+            session = self.http_pool.session("groq", settings["api_key"])
+            
+            files = {
+                'file': audio_file
+            }
+            data = {
+                'model': model,
+                'language': 'zh'
             }
             
-            with open("temp_audio.wav", "rb") as f:
-                files = {
-                    'file': ('audio.wav', f, 'audio/wav')
-                }
-                data = {
-                    'model': model,
-                    'language': 'zh'
-                }
-                
-                response = requests.post(
-                    f"{api_url}/audio/transcriptions",
-                    headers=headers,
-                    files=files,
-                    data=data
-                )
+            response = session.post(
+                f"{api_url}/audio/transcriptions",
+                files=files,
+                data=data,
+                headers={"Authorization": f"Bearer {api_key}"},
+                timeout=timeout
+            )
+            
+            check_response(response, "Groq API错误")
+            text = response.json()["text"]
+            self.logger.info("转写成功")
+            self.logger.debug(f"原始转写结果: {text}")
+            
+            return text
                 
-                if response.status_code == 200:
-                    text = response.json()["text"]
-                    self.logger.info("转写成功")
-                    self.logger.debug(f"原始转写结果: {text}")
-                    
-                    # 处理文本
-                    text = self._process_text(text)
-                    self.logger.debug(f"处理后的结果: {text}")
-                    
-                    return text
-                else:
-                    error_msg = f"Groq API错误: {response.text}"
-                    self.logger.error(error_msg)
-                    raise Exception(error_msg)
-                    
         except Exception as e:
-            self.logger.error(f"Groq��写失败: {str(e)}")
-            raise Exception(f"Groq转写失败: {str(e)}")
-        finally:
-            import os
-            if os.path.exists("temp_audio.wav"):
-                os.remove("temp_audio.wav")
+            self.logger.error(f"Groq转写失败: {str(e)}")
+            raise wrap_error(e, "Groq转写失败")
                 
-    def _transcribe_custom(self, audio_data):
+    def _transcribe_custom(self, audio_file, timeout, api_key):
         """使用自定义服务进行转写（使用自定义格式）"""
         settings = self.config.config["api_settings"]["transcription"]["custom"]
-        api_key = settings["api_key"]
         api_url = settings["api_url"]
         model = settings["model"]
         
@@ -196,40 +687,35 @@ class TranscriptionManager:
         try:
             # 使用自定义格式构建请求
             files = {
-                'file': ('audio.wav', audio_data, 'audio/wav'),
+                'file': audio_file,
                 'model': (None, model)
             }
             
-            headers = {
-                "Authorization": f"Bearer {api_key}"
-            }
+            session = self.http_pool.session("custom", settings["api_key"])
             
             self.logger.info("开始调用自定义API")
-            response = requests.post(api_url, files=files, headers=headers)
+            response = session.post(
+                api_url,
+                files=files,
+                headers={"Authorization": f"Bearer {api_key}"},
+                timeout=timeout
+            )
             
-            if response.status_code == 200:
-                try:
-                    text = response.json()["text"]
-                    self.logger.info("转写成功")
-                    self.logger.debug(f"原始转写结果: {text}")
-                    
-                    # 处理文本
-                    text = self._process_text(text)
-                    self.logger.debug(f"处理后的结果: {text}")
-                    
-                    return text
-                except KeyError:
-                    error_msg = f"API响应格式错误: {response.text}"
-                    self.logger.error(error_msg)
-                    raise Exception(error_msg)
-            else:
-                error_msg = f"API请求失败 (状态码: {response.status_code}): {response.text}"
+            check_response(response, "API请求失败")
+            try:
+                text = response.json()["text"]
+                self.logger.info("转写成功")
+                self.logger.debug(f"原始转写结果: {text}")
+                
+                return text
+            except KeyError:
+                error_msg = f"API响应格式错误: {response.text}"
                 self.logger.error(error_msg)
                 raise Exception(error_msg)
                 
         except Exception as e:
             self.logger.error(f"自定义API转写失败: {str(e)}")
-            raise Exception(f"自定义API转写失败: {str(e)}")
+            raise wrap_error(e, "自定义API转写失败")
             
     def _escape_for_sendkeys(self, text):
         """转义文本以适应SendKeys方法"""
@@ -246,13 +732,14 @@ class TranscriptionManager:
                 result += char
         return result
 
-    def insert_text(self, text):
-        """插入文本到当前焦点位置"""
+    def insert_text(self, text, settle=True):
+        """插入文本到当前焦点位置，连续插入的后续批次可以传settle=False跳过等待"""
         method = self.config.config.get("general_settings", {}).get("insert_method", "clipboard")
         
         try:
             # 给应用一点时间切换焦点
-            time.sleep(0.1)
+            if settle:
+                time.sleep(0.1)
             
             if method == "keyboard" and self._is_ascii_only(text):
                 # ASCII文本使用pyautogui
@@ -265,6 +752,32 @@ class TranscriptionManager:
             self.logger.error(f"文本插入失败: {str(e)}")
             raise Exception(f"文本插入失败: {str(e)}")
             
+    def foreground_window(self):
+        """当前前台窗口句柄，用于确认修正时焦点没有离开插入位置"""
+        try:
+            return win32gui.GetForegroundWindow()
+        except Exception:
+            return None
+    
+    def replace_inserted(self, old, new):
+        """把刚插入的old就地改为new：保留相同的开头，退格删除其余部分后插入新的结尾
+        
+        光标必须仍在old末尾，调用方需保证期间没有插入其他文本。
+        """
+        prefix = 0
+        for old_char, new_char in zip(old, new):
+            if old_char != new_char:
+                break
+            prefix += 1
+        try:
+            pyautogui.press('backspace', presses=len(old) - prefix)
+        except Exception as e:
+            self.logger.error(f"删除待修正文本失败: {str(e)}")
+            raise Exception(f"删除待修正文本失败: {str(e)}")
+        if new[prefix:]:
+            self.insert_text(new[prefix:], settle=False)
+        self.logger.debug(f"就地修正: 删除{len(old) - prefix}字, 插入{len(new) - prefix}字")
+    
     def _insert_by_clipboard(self, text):
         """使用剪贴板方法插入文本"""
         try:
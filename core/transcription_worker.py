@@ -0,0 +1,366 @@
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QObject, pyqtSignal
+from .incremental_inserter import IncrementalInserter
+from .transcript_stream import TranscriptStabilizer
+from .logger import Logger
+
+class DictationJob:
+    """一次听写任务，按录音顺序编号
+
+    任务依次经过 录音 -> 编码 -> 上传 -> 后处理 -> 插入 各阶段，
+    多个任务可以同时处于上传/后处理阶段，但插入严格按编号顺序进行。
+    """
+
+    STAGES = ("record", "encode", "upload", "post_process", "insert", "done")
+    STAGE_NAMES = {
+        "encode": "正在编码音频...",
+        "upload": "正在转写...",
+        "post_process": "正在处理文本...",
+        "insert": "正在插入文本..."
+    }
+
+    def __init__(self, seq, audio_data, capture_health=None, streaming_upload=None):
+        self.seq = seq
+        self.job_id = seq
+        self.audio_data = audio_data
+        self.capture_health = capture_health
+        self.streaming_upload = streaming_upload  # 录音期间已开始的流式上传或分段转写
+        self.stage = "record"
+        self.text = None
+        self.error = None
+        self.cancelled = False
+        self.inserted = False  # 流式后处理时文本已在后处理阶段边生成边插入
+        self.future = None
+
+class TranscriptionExecutor(QObject):
+    """在线程池中流水线执行听写任务，通过信号把进度和结果送回界面线程"""
+
+    job_progress = pyqtSignal(int, str)  # (任务编号, 进度说明)
+    job_finished = pyqtSignal(int, str)  # (任务编号, 转写文本)
+    job_failed = pyqtSignal(int, str)  # (任务编号, 错误信息)
+    job_cancelled = pyqtSignal(int)
+
+    def __init__(self, transcription_manager, config_manager):
+        super().__init__()
+        self.transcription_manager = transcription_manager
+        self.config = config_manager
+        self.logger = Logger(config_manager)
+        settings = config_manager.config["general_settings"]
+        self.max_pending = settings["transcription_queue_size"]
+        self._pool = ThreadPoolExecutor(
+            max_workers=settings["transcription_workers"],
+            thread_name_prefix="transcription"
+        )
+        self._seq = itertools.count(1)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # 按编号排序的插入：已完成但尚未轮到插入的任务暂存在这里
+        self._completed = {}
+        self._next_seq = 1
+        self._inserting = False
+        self._turn = threading.Condition(self._lock)  # 插入权释放时通知等待流式插入的任务
+        # 录音热键的松开状态（已松开时为set），由键盘监听器提供；未提供时不等待
+        self._hotkey_released = None
+
+    def set_hotkey_state(self, released):
+        """设置表示录音热键已松开的threading.Event
+
+        按住Ctrl录下一段时，模拟输入会变成快捷键（Ctrl+字母、Ctrl+退格删除整词），
+        模拟的Ctrl松开也可能打断进行中的录音，因此插入和修正都要等热键松开。
+        """
+        self._hotkey_released = released
+
+    def _wait_hotkey_released(self, job):
+        """等待录音热键松开，任务被取消时返回False"""
+        released = self._hotkey_released
+        if released is not None:
+            while not job.cancelled and not released.wait(0.1):
+                pass
+        return not job.cancelled
+
+    def _insert_text(self, job, text, settle=True):
+        """热键松开后插入文本，任务被取消时不插入"""
+        if self._hotkey_released is not None and not self._hotkey_released.is_set():
+            settle = True  # 等过热键后需要重新等待焦点
+        if self._wait_hotkey_released(job):
+            self.transcription_manager.insert_text(text, settle)
+
+    def pending_count(self):
+        """排队和执行中的任务数"""
+        with self._lock:
+            return len(self._jobs)
+
+    def submit(self, audio_data, capture_health=None, streaming_upload=None):
+        """提交听写任务，返回任务编号，队列已满时返回None"""
+        with self._lock:
+            if len(self._jobs) >= self.max_pending:
+                self.logger.warning(f"转写队列已满({self.max_pending})，丢弃新的录音")
+                if streaming_upload:
+                    streaming_upload.abort()
+                return None
+            job = DictationJob(next(self._seq), audio_data, capture_health, streaming_upload)
+            self._jobs[job.seq] = job
+        job.future = self._pool.submit(self._run, job)
+        return job.seq
+
+    def cancel(self, job_id):
+        """取消任务：未开始的直接移出队列，执行中的丢弃结果"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if not job:
+            return False
+        job.cancelled = True
+        if job.future and job.future.cancel():
+            # 任务不会再执行，仍需占住它的编号让后续任务能够插入
+            if job.streaming_upload:
+                job.streaming_upload.abort()
+            self._deliver(job)
+        return True
+
+    def cancel_all(self):
+        """取消所有未完成的任务"""
+        with self._lock:
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            self.cancel(job_id)
+        return len(job_ids)
+
+    def shutdown(self):
+        """退出时取消任务并关闭线程池，不等待进行中的网络请求"""
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _set_stage(self, job, stage):
+        job.stage = stage
+        if stage in DictationJob.STAGE_NAMES:
+            self.job_progress.emit(job.seq, DictationJob.STAGE_NAMES[stage])
+
+    def _run(self, job):
+        """执行编码、上传和后处理阶段，结果交给按序插入"""
+        manager = self.transcription_manager
+        try:
+            cache_key = manager.cache.key(job.audio_data)
+            cached = manager.cache.get(cache_key)
+            if cached is not None:
+                # 同一段录音已转写过，直接使用缓存结果
+                if job.streaming_upload:
+                    job.streaming_upload.abort()
+                    job.streaming_upload = None
+                job.text = cached
+                manager.record_history(job.text, job.capture_health)
+            else:
+                text = self._transcribe(job)
+                if job.inserted:
+                    # 流式转写已边接收边插入，并完成了后处理和修正
+                    job.text = text
+                elif not job.cancelled:
+                    self._set_stage(job, "post_process")
+                    text, needs_llm = manager.prepare_post_process(text)
+                    if needs_llm and manager.streaming_post_process_enabled():
+                        job.text = self._stream_post_process(job, text)
+                    elif needs_llm and manager.optimistic_post_process_enabled():
+                        job.text = self._optimistic_post_process(job, text)
+                    elif needs_llm:
+                        job.text = manager.post_process(text)
+                    else:
+                        job.text = text
+                if not job.cancelled:
+                    manager.cache.put(cache_key, job.text)
+                    manager.record_history(job.text, job.capture_health)
+        except Exception as e:
+            self.logger.error(f"听写任务{job.seq}失败: {str(e)}")
+            job.error = str(e)
+        self._deliver(job)
+
+    def _transcribe(self, job):
+        """转写阶段，返回原始文本，任务取消时返回None"""
+        manager = self.transcription_manager
+        text = self._finish_streaming_upload(job)
+        if text is not None or job.cancelled:
+            return text
+        provider = manager.resolve_provider(manager.current_provider(), job.audio_data)
+        segments = manager.split_audio(job.audio_data, provider)
+        job.audio_data = None
+        if len(segments) > 1:
+            # 长录音切分后并行转写，编码在各片段的请求中进行
+            self._set_stage(job, "upload")
+            return manager.transcribe_segments(segments, provider)
+        self._set_stage(job, "encode")
+        audio_file = manager.encode_audio(segments[0], provider)
+        if job.cancelled:
+            return None
+        self._set_stage(job, "upload")
+        if manager.partial_insertion_enabled(provider):
+            events = manager.open_transcription_stream(segments[0], provider, audio_file)
+            return self._insert_transcription_stream(job, events)
+        # 对冲或故障转移时其他提供商需要用原始音频重新编码
+        return manager.transcribe_audio(segments[0], provider, audio_file)
+
+    def _insert_transcription_stream(self, job, events):
+        """等轮到本任务插入后，边接收转写事件边插入稳定下来的文本
+
+        流结束后对完整结果做清理和后处理，再把已插入的文本就地修正为最终文本并返回。
+        """
+        manager = self.transcription_manager
+        if not self._wait_turn(job):
+            events.close()
+            return None
+        inserter = IncrementalInserter(lambda text, settle: self._insert_text(job, text, settle))
+        stabilizer = TranscriptStabilizer()
+        try:
+            if not self._wait_hotkey_released(job):
+                return None
+            window = manager.foreground_window()
+            self._set_stage(job, "insert")
+            for kind, text in events:
+                if job.cancelled:
+                    return None
+                inserter.feed(stabilizer.update(kind, text))
+            inserted = inserter.finish()
+            self._set_stage(job, "post_process")
+            text, needs_llm = manager.prepare_post_process(stabilizer.text)
+            if needs_llm:
+                text = manager.post_process(text)
+            self._correct_inserted(job, inserted, text, window)
+            return text
+        finally:
+            events.close()
+            job.inserted = True
+            with self._turn:
+                self._inserting = False
+                self._turn.notify_all()
+
+    def _correct_inserted(self, job, inserted, text, window):
+        """把已插入的文本就地修正为最终文本，焦点已切换到其他窗口或任务被取消时跳过"""
+        manager = self.transcription_manager
+        if text == inserted or not self._wait_hotkey_released(job):
+            return
+        if window != manager.foreground_window():
+            self.logger.info(f"焦点已切换，跳过就地修正: {text}")
+            return
+        self._set_stage(job, "insert")
+        manager.replace_inserted(inserted, text)
+
+    def _stream_post_process(self, job, text):
+        """流式后处理：等轮到本任务插入后，边接收模型输出边插入，返回插入的全部文本"""
+        if not self._wait_turn(job):
+            return None
+        inserter = IncrementalInserter(lambda text, settle: self._insert_text(job, text, settle))
+        try:
+            self._set_stage(job, "insert")
+            for delta in self.transcription_manager.text_processor.process_stream(text):
+                if job.cancelled:
+                    # 已取消时不再插入缓冲中的剩余文本
+                    return None
+                inserter.feed(delta)
+            return inserter.finish().strip()
+        finally:
+            job.inserted = True
+            with self._turn:
+                self._inserting = False
+                self._turn.notify_all()
+
+    def _optimistic_post_process(self, job, text):
+        """先插入清理后的转写文本，后处理结果不同时就地修正，返回最终文本
+
+        修正完成前一直持有插入权，保证刚插入的文本仍在光标前、没有被后续听写隔开；
+        焦点已切换到其他窗口或任务被取消时不再修正。后处理失败时已插入的文本保留，任务按失败上报。
+        """
+        manager = self.transcription_manager
+        if not self._wait_turn(job):
+            return None
+        try:
+            self._set_stage(job, "insert")
+            if not self._wait_hotkey_released(job):
+                return None
+            window = manager.foreground_window()
+            self._insert_text(job, text)
+            job.inserted = True
+            self._set_stage(job, "post_process")
+            corrected = manager.post_process(text)
+            self._correct_inserted(job, text, corrected, window)
+            return corrected
+        finally:
+            with self._turn:
+                self._inserting = False
+                self._turn.notify_all()
+
+    def _wait_turn(self, job):
+        """等待之前的任务都插入完毕并取得插入权，任务被取消时返回False
+
+        任务按编号顺序提交到线程池，编号更小的任务一定已在执行或已完成，等待不会死锁。
+        """
+        with self._turn:
+            while not job.cancelled and (self._next_seq != job.seq or self._inserting):
+                self._turn.wait(0.1)
+            if job.cancelled:
+                return False
+            self._inserting = True
+            return True
+
+    def reinsert_last(self):
+        """按顺序重新插入上次听写的文本（来自转写缓存，不需要网络），没有时返回None"""
+        text = self.transcription_manager.cache.last()
+        if text is None:
+            return None
+        with self._lock:
+            job = DictationJob(next(self._seq), None)
+            job.text = text
+            self._jobs[job.seq] = job
+        job.future = self._pool.submit(self._deliver, job)
+        return job.seq
+
+    def _finish_streaming_upload(self, job):
+        """等待录音期间开始的流式上传或分段转写返回，失败时返回None改用普通上传"""
+        upload, job.streaming_upload = job.streaming_upload, None
+        if not upload:
+            return None
+        if job.cancelled:
+            upload.abort()
+            return None
+        self._set_stage(job, "upload")
+        try:
+            return upload.finish()
+        except Exception as e:
+            self.logger.warning(f"听写任务{job.seq}边录边传失败，改用普通上传: {str(e)}")
+            return None
+
+    def _deliver(self, job):
+        """登记完成的任务，并按编号顺序插入所有已就绪的文本"""
+        with self._lock:
+            self._completed[job.seq] = job
+            if self._inserting:
+                # 已有线程在插入，它会顺带处理本任务
+                return
+            self._inserting = True
+        while True:
+            with self._lock:
+                job = self._completed.pop(self._next_seq, None)
+                if job is None:
+                    self._inserting = False
+                    self._turn.notify_all()
+                    return
+                self._next_seq += 1
+            self._insert(job)
+
+    def _insert(self, job):
+        try:
+            if job.cancelled:
+                self.logger.info(f"听写任务{job.seq}已取消，丢弃结果")
+                self.job_cancelled.emit(job.seq)
+            elif job.error:
+                self.job_failed.emit(job.seq, job.error)
+            else:
+                self._set_stage(job, "insert")
+                if job.text and not job.inserted:
+                    self._insert_text(job, job.text)
+                self.job_finished.emit(job.seq, job.text or "")
+        except Exception as e:
+            self.logger.error(f"听写任务{job.seq}插入失败: {str(e)}")
+            self.job_failed.emit(job.seq, str(e))
+        finally:
+            job.stage = "done"
+            with self._lock:
+                self._jobs.pop(job.seq, None)
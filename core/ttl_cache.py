@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+class TTLCache:
+    """带过期时间的LRU缓存，并合并相同键的并发计算
+
+    同一个键正在计算时，后来的调用方等待同一个结果而不是重复计算；
+    计算失败不缓存，异常传给所有等待方。
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (过期时间, 值)
+        self._inflight = {}  # key -> Future
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def get(self, key):
+        """未过期的缓存值，没有时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        if self.max_entries > 0 and self.ttl > 0:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+            future = self._inflight.get(key)
+            if future:
+                self.stats["coalesced"] += 1
+                owner = False
+            else:
+                self.stats["misses"] += 1
+                future = self._inflight[key] = Future()
+                owner = True
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._inflight[key]
+            self._store(key, value)
+        future.set_result(value)
+        return value
@@ -0,0 +1,103 @@
+import numpy as np
+from .wav_utils import parse_wav, pcm_to_wav
+from .logger import Logger
+
+class VoiceActivityDetector:
+    """基于短时能量和过零率的语音活动检测，用于上传前去除静音"""
+
+    FRAME_TIME = 0.02  # 分析帧长(秒)
+
+    def __init__(self, config_manager):
+        self.config = config_manager
+        self.logger = Logger(config_manager)
+
+    def frame_features(self, samples, sample_rate):
+        """按帧计算短时能量(dB)和过零率，返回(能量, 过零率, 帧长)，不足一帧的尾部忽略"""
+        frame_len = max(int(sample_rate * self.FRAME_TIME), 1)
+        count = len(samples) // frame_len
+        frames = samples[:count * frame_len].reshape(count, frame_len)
+        energy_db = 10 * np.log10(np.mean(np.square(frames), axis=1) + 1e-10)
+        zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+        return energy_db, zcr, frame_len
+
+    def classify(self, energy_db, zcr, noise_floor):
+        """根据能量和过零率判断每帧是否为语音（不含前后余量）"""
+        settings = self.config.config["audio_settings"]
+        # 阈值取固定门限和噪声底+余量中的较大值，适应不同的环境噪声
+        threshold = max(settings["vad_threshold_db"], noise_floor + 6.0)
+        voiced = energy_db > threshold
+        # 清辅音能量较低但过零率高
+        unvoiced = (zcr > settings["vad_zcr_threshold"]) & (energy_db > threshold - 10.0)
+        return voiced | unvoiced
+
+    def speech_frames(self, samples, sample_rate):
+        """返回每帧是否为语音的布尔数组和帧长(样本数)"""
+        energy_db, zcr, frame_len = self.frame_features(samples, sample_rate)
+        if len(energy_db) == 0:
+            return np.zeros(0, dtype=bool), frame_len
+        speech = self.classify(energy_db, zcr, np.percentile(energy_db, 10))
+
+        # 在语音前后保留一段余量，避免切掉音节的起止
+        padding = int(self.config.config["audio_settings"]["vad_padding"] / self.FRAME_TIME)
+        if padding > 0 and speech.any():
+            kernel = np.ones(2 * padding + 1, dtype=np.int32)
+            speech = np.convolve(speech.astype(np.int32), kernel, mode='same') > 0
+        return speech, frame_len
+
+    def _compress_pauses(self, speech, max_pause_frames):
+        """把语音内部超过上限的停顿缩短为上限长度，返回保留帧的布尔数组"""
+        keep = speech.copy()
+        edges = np.flatnonzero(np.diff(speech.astype(np.int8)))
+        # 静音段的起止帧：从语音结束到下一段语音开始
+        starts = edges[speech[edges]] + 1
+        ends = edges[~speech[edges]] + 1
+        if len(starts) and len(ends):
+            ends = ends[ends > starts[0]]
+            for start, end in zip(starts, ends):
+                if end - start > max_pause_frames:
+                    keep[start:end] = False
+                    half = max_pause_frames // 2
+                    keep[start:start + half] = True
+                    keep[end - (max_pause_frames - half):end] = True
+        return keep
+
+    def trim(self, audio_data):
+        """去除WAV音频首尾静音，并按设置压缩内部长停顿
+
+        返回(处理后的WAV数据, 去除的秒数)，整段都是静音时WAV数据为None
+        """
+        pcm, sample_rate, channels = parse_wav(audio_data)
+        total = len(pcm)
+        samples = pcm.mean(axis=1, dtype=np.float32) if channels > 1 else pcm[:, 0].astype(np.float32)
+        samples /= 32768.0
+
+        speech, frame_len = self.speech_frames(samples, sample_rate)
+        if not speech.any():
+            self.logger.info(f"未检测到语音，整段音频({total / sample_rate:.2f}秒)被视为静音")
+            return None, total / sample_rate
+
+        first = int(np.argmax(speech))
+        last = len(speech) - int(np.argmax(speech[::-1]))
+        keep = np.zeros(len(speech), dtype=bool)
+        max_pause = self.config.config["audio_settings"]["vad_max_pause"]
+        if max_pause > 0:
+            keep[first:last] = self._compress_pauses(speech[first:last], max(int(max_pause / self.FRAME_TIME), 1))
+        else:
+            keep[first:last] = True
+
+        # 帧级保留区间转换为样本区间，最后一帧为语音时保留不足一帧的尾部
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], keep.astype(np.int8), [0]))))
+        bounds = edges.reshape(-1, 2) * frame_len
+        if last == len(speech):
+            bounds[-1, 1] = total
+        kept = int((bounds[:, 1] - bounds[:, 0]).sum())
+        if kept == total:
+            return audio_data, 0.0
+
+        if len(bounds) == 1:
+            trimmed = pcm[bounds[0, 0]:bounds[0, 1]]
+        else:
+            trimmed = np.concatenate([pcm[start:end] for start, end in bounds])
+        removed = (total - kept) / sample_rate
+        self.logger.info(f"静音裁剪: 去除{removed:.2f}秒，保留{kept / sample_rate:.2f}秒")
+        return pcm_to_wav(trimmed, sample_rate, channels), removed
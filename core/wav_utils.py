@@ -0,0 +1,42 @@
+import numpy as np
+import struct
+
+def build_wav_header(data_size, sample_rate, channels, sample_width=2):
+    """构建44字节的PCM WAV文件头"""
+    byte_rate = sample_rate * channels * sample_width
+    block_align = channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, byte_rate, block_align, sample_width * 8,
+        b'data', data_size
+    )
+
+def parse_wav(audio_data):
+    """解析16位PCM WAV数据，返回(int16样本视图, 采样率, 声道数)，不拷贝样本"""
+    if audio_data[:4] != b'RIFF' or audio_data[8:12] != b'WAVE':
+        raise Exception("音频数据不是有效的WAV格式")
+    offset = 12
+    sample_rate = channels = None
+    while offset + 8 <= len(audio_data):
+        chunk_id, chunk_size = struct.unpack_from('<4sI', audio_data, offset)
+        offset += 8
+        if chunk_id == b'fmt ':
+            _, channels, sample_rate = struct.unpack_from('<HHI', audio_data, offset)
+        elif chunk_id == b'data':
+            end = min(offset + chunk_size, len(audio_data))
+            end -= (end - offset) % 2
+            pcm = np.frombuffer(audio_data, dtype=np.int16, count=(end - offset) // 2, offset=offset)
+            return pcm.reshape(-1, channels), sample_rate, channels
+        offset += chunk_size + (chunk_size & 1)
+    raise Exception("WAV数据中缺少音频数据块")
+
+def pcm_to_wav(pcm, sample_rate, channels):
+    """把int16样本打包为WAV字节"""
+    data = memoryview(np.ascontiguousarray(pcm)).cast('B')
+    return b''.join((build_wav_header(data.nbytes, sample_rate, channels), data))
+
+def wav_duration(audio_data):
+    """WAV数据的时长(秒)"""
+    pcm, sample_rate, _ = parse_wav(audio_data)
+    return len(pcm) / sample_rate
@@ -6,6 +6,7 @@ from PyQt6.QtGui import QIcon, QFont
 from .settings_dialog import SettingsDialog
 from .wave_visualizer import WaveVisualizerWindow
 from core.transcription_manager import TranscriptionManager
+from core.transcription_worker import TranscriptionExecutor
 import time
 import os
 from utils.resource_helper import get_resource_path
@@ -17,10 +18,17 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.config_manager = config_manager
         self.transcription_manager = TranscriptionManager(config_manager)
+        # 转写在线程池中执行，界面线程只接收进度和结果信号
+        self.transcription_executor = TranscriptionExecutor(self.transcription_manager, config_manager)
+        self.transcription_executor.job_progress.connect(self.on_transcription_progress)
+        self.transcription_executor.job_finished.connect(self.on_transcription_finished)
+        self.transcription_executor.job_failed.connect(self.on_transcription_failed)
+        self.transcription_executor.job_cancelled.connect(self.on_transcription_cancelled)
         self.recording_start_time = 0
         self.history_window = None  # 添加历史记录窗口的引用
         self._quitting = False  # 添加退出标志
         self.wave_window = None
+        self.level_queue = None  # 录音电平队列，由波形窗口按帧率读取
         
         # 修改图标加载
         icon_path = get_resource_path(os.path.join("resources", "app.ico"))
@@ -156,6 +164,12 @@ class MainWindow(QMainWindow):
         settings_action = tray_menu.addAction(self.app_icon, "设置")
         settings_action.triggered.connect(self.show_settings)
         
+        cancel_action = tray_menu.addAction(self.app_icon, "取消转写")
+        cancel_action.triggered.connect(self.cancel_transcriptions)
+        
+        reinsert_action = tray_menu.addAction(self.app_icon, "重新插入上次听写")
+        reinsert_action.triggered.connect(self.reinsert_last_dictation)
+        
         tray_menu.addSeparator()
         quit_action = tray_menu.addAction(self.app_icon, "退出")
         quit_action.triggered.connect(self.quit_application)
@@ -266,7 +280,7 @@ class MainWindow(QMainWindow):
         # self.setStatusBar(self.status_bar)
     
     def show_settings(self):
-        dialog = SettingsDialog(self.config_manager)
+        dialog = SettingsDialog(self.config_manager, self)
         dialog.exec()
     
     def update_status(self, message):
@@ -274,27 +288,54 @@ class MainWindow(QMainWindow):
         self.status_label.setText(message)
         # 移除对 status_bar 的引用，因为我在使用固定高度的状态容器
     
-    def transcribe_audio(self, audio_data):
+    def transcribe_audio(self, audio_data, capture_health=None, streaming_upload=None):
         """音频转写的槽函数"""
         if not audio_data:
             self.update_status("错误: 未获取到录音数据")
             return
             
-        self.update_status("正在转写...")
-        try:
-            text = self.transcription_manager.transcribe(audio_data)
-            self.transcription_manager.insert_text(text)
-            # 显示转录文本
-            self.update_status(f"转写完成\n转录文本：{text}")
-            
-            # 如果历史记录窗口已打开，刷新显示
-            if hasattr(self, 'history_window') and self.history_window and self.history_window.isVisible():
-                self.history_window.refresh_history()
-            
-        except Exception as e:
-            error_msg = f"错误: {str(e)}\n请查看logs文件夹中的日志文件获取详细信息"
-            print(error_msg)
-            self.update_status(error_msg)
+        job_id = self.transcription_executor.submit(audio_data, capture_health, streaming_upload)
+        if job_id is None:
+            self.update_status("错误: 转写队列已满，本次录音已丢弃")
+            return
+        pending = self.transcription_executor.pending_count()
+        if pending > 1:
+            self.update_status(f"已加入转写队列（{pending}个任务进行中）")
+        else:
+            self.update_status("正在转写...")
+    
+    def on_transcription_progress(self, job_id, message):
+        """转写任务进度"""
+        self.update_status(message)
+    
+    def on_transcription_finished(self, job_id, text):
+        """转写任务完成"""
+        # 显示转录文本
+        self.update_status(f"转写完成\n转录文本：{text}")
+        
+        # 如果历史记录窗口已打开，刷新显示
+        if hasattr(self, 'history_window') and self.history_window and self.history_window.isVisible():
+            self.history_window.refresh_history()
+    
+    def on_transcription_failed(self, job_id, error):
+        """转写任务失败"""
+        error_msg = f"错误: {error}\n请查看logs文件夹中的日志文件获取详细信息"
+        print(error_msg)
+        self.update_status(error_msg)
+    
+    def on_transcription_cancelled(self, job_id):
+        """转写任务已取消"""
+        self.update_status("转写已取消")
+    
+    def cancel_transcriptions(self):
+        """取消所有未完成的转写任务"""
+        if not self.transcription_executor.cancel_all():
+            self.update_status("当前没有进行中的转写")
+    
+    def reinsert_last_dictation(self):
+        """从转写缓存重新插入上次听写的文本"""
+        if self.transcription_executor.reinsert_last() is None:
+            self.update_status("没有可重新插入的听写")
     
     def start_recording(self):
         """录音开始的槽函数"""
@@ -304,7 +345,7 @@ class MainWindow(QMainWindow):
         
         # 显示波形窗口
         if not self.wave_window:
-            self.wave_window = WaveVisualizerWindow(self.config_manager)
+            self.wave_window = WaveVisualizerWindow(self.config_manager, self.level_queue)
         self.wave_window.show()
         
     def stop_recording(self):
@@ -325,6 +366,8 @@ class MainWindow(QMainWindow):
         """启动录音触发定时器"""
         trigger_time = int(self.config_manager.config["audio_settings"]["trigger_press_time"] * 1000)
         self.trigger_timer.start(trigger_time)
+        # 利用按键到上传之间的空闲时间预热网络连接
+        self.transcription_manager.prewarm_connections()
     
     def stop_trigger_timer(self):
         """停止录音触发定时器"""
@@ -341,12 +384,15 @@ class MainWindow(QMainWindow):
     def quit_application(self):
         """完全退出应用程序"""
         self.tray_icon.hide()  # 隐藏托盘图标
+        self.transcription_executor.shutdown()
+        self.transcription_manager.close()
         QApplication.quit()  # 退出应用
 
-    def update_wave_data(self, data):
-        """更新波形显示"""
+    def set_level_queue(self, level_queue):
+        """设置录音电平队列"""
+        self.level_queue = level_queue
         if self.wave_window:
-            self.wave_window.update_wave_data(data)
+            self.wave_window.level_queue = level_queue
 
     def config_updated(self):
         """配置更新后的处理"""
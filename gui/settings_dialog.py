@@ -1,11 +1,11 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTabWidget,
                            QLabel, QLineEdit, QComboBox, QCheckBox, 
                            QPushButton, QGroupBox, QWidget, QMessageBox, QScrollArea)
-from PyQt6.QtGui import QDoubleValidator
+from PyQt6.QtGui import QDoubleValidator, QIntValidator
 
 class SettingsDialog(QDialog):
-    def __init__(self, config_manager):
-        super().__init__()
+    def __init__(self, config_manager, parent=None):
+        super().__init__(parent)
         self.config = config_manager
         self.setStyleSheet("""
             QDialog {
@@ -66,6 +66,12 @@ class SettingsDialog(QDialog):
         trans_layout.addWidget(QLabel("API密钥:"))
         trans_layout.addWidget(self.trans_openai_key)
         
+        self.trans_openai_keys = QLineEdit()
+        self.trans_openai_keys.setText(", ".join(self.config.config["api_settings"]["transcription"]["openai"]["api_keys"]))
+        self.trans_openai_keys.setPlaceholderText("可选，多个密钥用逗号分隔，轮流使用以分摊限额")
+        trans_layout.addWidget(QLabel("额外API密钥:"))
+        trans_layout.addWidget(self.trans_openai_keys)
+        
         self.trans_openai_url = QLineEdit()
         self.trans_openai_url.setText(self.config.config["api_settings"]["transcription"]["openai"]["api_url"])
         trans_layout.addWidget(QLabel("API地址:"))
@@ -82,6 +88,12 @@ class SettingsDialog(QDialog):
         trans_layout.addWidget(QLabel("API密钥:"))
         trans_layout.addWidget(self.trans_groq_key)
         
+        self.trans_groq_keys = QLineEdit()
+        self.trans_groq_keys.setText(", ".join(self.config.config["api_settings"]["transcription"]["groq"]["api_keys"]))
+        self.trans_groq_keys.setPlaceholderText("可选，多个密钥用逗号分隔，轮流使用以分摊限额")
+        trans_layout.addWidget(QLabel("额外API密钥:"))
+        trans_layout.addWidget(self.trans_groq_keys)
+        
         self.trans_groq_model = QLineEdit()
         self.trans_groq_model.setText(self.config.config["api_settings"]["transcription"]["groq"]["model"])
         trans_layout.addWidget(QLabel("模型名称:"))
@@ -93,6 +105,12 @@ class SettingsDialog(QDialog):
         trans_layout.addWidget(QLabel("API密钥:"))
         trans_layout.addWidget(self.trans_custom_key)
         
+        self.trans_custom_keys = QLineEdit()
+        self.trans_custom_keys.setText(", ".join(self.config.config["api_settings"]["transcription"]["custom"]["api_keys"]))
+        self.trans_custom_keys.setPlaceholderText("可选，多个密钥用逗号分隔，轮流使用以分摊限额")
+        trans_layout.addWidget(QLabel("额外API密钥:"))
+        trans_layout.addWidget(self.trans_custom_keys)
+        
         self.trans_custom_url = QLineEdit()
         self.trans_custom_url.setText(self.config.config["api_settings"]["transcription"]["custom"]["api_url"])
         trans_layout.addWidget(QLabel("API地址:"))
@@ -157,11 +175,39 @@ class SettingsDialog(QDialog):
         trans_layout = QVBoxLayout()
         
         self.provider = QComboBox()
-        self.provider.addItems(["openai", "groq", "custom"])
+        self.provider.addItems(["openai", "groq", "custom", "auto"])
         self.provider.setCurrentText(self.config.config["transcription_settings"]["provider"])
-        trans_layout.addWidget(QLabel("转写提供商:"))
+        trans_layout.addWidget(QLabel("转写提供商（auto: 按近期耗时自动选择最快的）:"))
         trans_layout.addWidget(self.provider)
         
+        self.auto_probe = QCheckBox("auto模式下定期探测各提供商的耗时（会产生少量API调用）")
+        self.auto_probe.setChecked(self.config.config["transcription_settings"]["auto_probe"])
+        trans_layout.addWidget(self.auto_probe)
+        
+        self.live_segmentation = QCheckBox("录音时按停顿分段实时转写（长录音松开按键后更快出结果）")
+        self.live_segmentation.setChecked(self.config.config["transcription_settings"]["live_segmentation"])
+        trans_layout.addWidget(self.live_segmentation)
+        
+        self.hedge_enabled = QCheckBox("主提供商响应慢时同时请求备用提供商（先返回者胜出）")
+        self.hedge_enabled.setChecked(self.config.config["transcription_settings"]["hedge_enabled"])
+        trans_layout.addWidget(self.hedge_enabled)
+        
+        self.hedge_provider = QComboBox()
+        self.hedge_provider.addItems(["openai", "groq", "custom"])
+        self.hedge_provider.setCurrentText(self.config.config["transcription_settings"]["hedge_provider"])
+        trans_layout.addWidget(QLabel("备用提供商:"))
+        trans_layout.addWidget(self.hedge_provider)
+        
+        self.failover_enabled = QCheckBox("提供商连续失败时自动改用故障转移提供商")
+        self.failover_enabled.setChecked(self.config.config["transcription_settings"]["failover_enabled"])
+        trans_layout.addWidget(self.failover_enabled)
+        
+        self.failover_provider = QComboBox()
+        self.failover_provider.addItems(["openai", "groq", "custom"])
+        self.failover_provider.setCurrentText(self.config.config["transcription_settings"]["failover_provider"])
+        trans_layout.addWidget(QLabel("故障转移提供商:"))
+        trans_layout.addWidget(self.failover_provider)
+        
         trans_group.setLayout(trans_layout)
         layout.addWidget(trans_group)  # 添加转写设置组到主布局
         
@@ -184,6 +230,21 @@ class SettingsDialog(QDialog):
         post_layout.addWidget(QLabel("后处理提示词:"))
         post_layout.addWidget(self.post_prompt)
         
+        self.post_bypass_length = QLineEdit()
+        self.post_bypass_length.setText(str(self.config.config["transcription_settings"]["post_process_bypass_length"]))
+        self.post_bypass_length.setPlaceholderText("默认: 0（不跳过）")
+        self.post_bypass_length.setValidator(QIntValidator(0, 100))
+        post_layout.addWidget(QLabel("不超过此字数且无需清理的短文本跳过后处理:"))
+        post_layout.addWidget(self.post_bypass_length)
+        
+        self.post_streaming = QCheckBox("后处理结果边生成边插入")
+        self.post_streaming.setChecked(self.config.config["transcription_settings"]["post_process_streaming"])
+        post_layout.addWidget(self.post_streaming)
+        
+        self.post_optimistic = QCheckBox("先插入转写结果，后处理完成后就地修正")
+        self.post_optimistic.setChecked(self.config.config["transcription_settings"]["post_process_optimistic"])
+        post_layout.addWidget(self.post_optimistic)
+        
         post_group.setLayout(post_layout)
         layout.addWidget(post_group)
         
@@ -328,6 +389,34 @@ class SettingsDialog(QDialog):
         trigger_time_layout.addWidget(self.trigger_press_time)
         audio_layout.addLayout(trigger_time_layout)
         
+        # 常开录音设备设置
+        self.persistent_stream = QCheckBox("保持录音设备常开（按下即录，不截断开头）")
+        self.persistent_stream.setChecked(self.config.config["audio_settings"]["persistent_stream"])
+        audio_layout.addWidget(self.persistent_stream)
+        
+        preroll_layout = QHBoxLayout()
+        preroll_layout.addWidget(QLabel("预录时长(秒):"))
+        self.preroll_time = QLineEdit()
+        self.preroll_time.setText(str(self.config.config["audio_settings"]["preroll_time"]))
+        self.preroll_time.setPlaceholderText("默认: 0.4")
+        self.preroll_time.setValidator(QDoubleValidator(0.0, 1.0, 2))
+        preroll_layout.addWidget(self.preroll_time)
+        audio_layout.addLayout(preroll_layout)
+        
+        # 静音裁剪设置
+        self.vad_enabled = QCheckBox("上传前去除首尾静音")
+        self.vad_enabled.setChecked(self.config.config["audio_settings"]["vad_enabled"])
+        audio_layout.addWidget(self.vad_enabled)
+        
+        max_pause_layout = QHBoxLayout()
+        max_pause_layout.addWidget(QLabel("停顿压缩上限(秒):"))
+        self.vad_max_pause = QLineEdit()
+        self.vad_max_pause.setText(str(self.config.config["audio_settings"]["vad_max_pause"]))
+        self.vad_max_pause.setPlaceholderText("默认: 0（不压缩）")
+        self.vad_max_pause.setValidator(QDoubleValidator(0.0, 10.0, 1))
+        max_pause_layout.addWidget(self.vad_max_pause)
+        audio_layout.addLayout(max_pause_layout)
+        
         # 更新帮助文本
         help_text = QLabel(
             "提示：\n"
@@ -335,7 +424,9 @@ class SettingsDialog(QDialog):
             "- 最小按压时间：按住Ctrl键少于此时��将不会触发转写\n"
             "- 最大录音时间：超过此时间将自动停止录音\n"
             "- 建议录音触发时间设置在0.05-0.2秒之间\n"
-            "- 建议最小按压时间设置在0.3-1.0秒之间"
+            "- 建议最小按压时间设置在0.3-1.0秒之间\n"
+            "- 常开模式：录音设备保持打开，按下Ctrl前的预录音频会拼接到录音开头\n"
+            "- 停顿压缩上限：句中超过此时长的停顿会被缩短，0表示不压缩"
         )
         help_text.setWordWrap(True)
         audio_layout.addWidget(help_text)
@@ -403,13 +494,22 @@ class SettingsDialog(QDialog):
         try:
             # 保存转录服务设置
             self.config.config["api_settings"]["transcription"]["openai"]["api_key"] = self.trans_openai_key.text()
+            self.config.config["api_settings"]["transcription"]["openai"]["api_keys"] = [
+                key.strip() for key in self.trans_openai_keys.text().split(",") if key.strip()
+            ]
             self.config.config["api_settings"]["transcription"]["openai"]["api_url"] = self.trans_openai_url.text()
             self.config.config["api_settings"]["transcription"]["openai"]["model"] = self.trans_openai_model.text()
             
             self.config.config["api_settings"]["transcription"]["groq"]["api_key"] = self.trans_groq_key.text()
+            self.config.config["api_settings"]["transcription"]["groq"]["api_keys"] = [
+                key.strip() for key in self.trans_groq_keys.text().split(",") if key.strip()
+            ]
             self.config.config["api_settings"]["transcription"]["groq"]["model"] = self.trans_groq_model.text()
             
             self.config.config["api_settings"]["transcription"]["custom"]["api_key"] = self.trans_custom_key.text()
+            self.config.config["api_settings"]["transcription"]["custom"]["api_keys"] = [
+                key.strip() for key in self.trans_custom_keys.text().split(",") if key.strip()
+            ]
             self.config.config["api_settings"]["transcription"]["custom"]["api_url"] = self.trans_custom_url.text()
             self.config.config["api_settings"]["transcription"]["custom"]["model"] = self.trans_custom_model.text()
             
@@ -422,9 +522,18 @@ class SettingsDialog(QDialog):
             
             # 保存转写设置
             self.config.config["transcription_settings"]["provider"] = self.provider.currentText()
+            self.config.config["transcription_settings"]["auto_probe"] = self.auto_probe.isChecked()
+            self.config.config["transcription_settings"]["live_segmentation"] = self.live_segmentation.isChecked()
+            self.config.config["transcription_settings"]["hedge_enabled"] = self.hedge_enabled.isChecked()
+            self.config.config["transcription_settings"]["hedge_provider"] = self.hedge_provider.currentText()
+            self.config.config["transcription_settings"]["failover_enabled"] = self.failover_enabled.isChecked()
+            self.config.config["transcription_settings"]["failover_provider"] = self.failover_provider.currentText()
             self.config.config["transcription_settings"]["post_process"] = self.post_process.isChecked()
             self.config.config["transcription_settings"]["post_process_provider"] = self.post_provider.currentText()
             self.config.config["transcription_settings"]["post_process_prompt"] = self.post_prompt.text()
+            self.config.config["transcription_settings"]["post_process_bypass_length"] = int(self.post_bypass_length.text() or 0)
+            self.config.config["transcription_settings"]["post_process_streaming"] = self.post_streaming.isChecked()
+            self.config.config["transcription_settings"]["post_process_optimistic"] = self.post_optimistic.isChecked()
             
             # 保存文本清理设置
             self.config.config["transcription_settings"]["remove_punctuation"] = self.remove_punctuation.isChecked()
@@ -436,6 +545,8 @@ class SettingsDialog(QDialog):
                 trigger_press_time = float(self.trigger_press_time.text())
                 min_press_time = float(self.min_press_time.text())
                 max_record_time = float(self.max_record_time.text())
+                preroll_time = float(self.preroll_time.text())
+                vad_max_pause = float(self.vad_max_pause.text())
                 
                 if trigger_press_time < 0.05 or trigger_press_time > 0.5:
                     QMessageBox.warning(self, "警告", "录音触发时间应在0.05-0.5秒之间")
@@ -452,10 +563,22 @@ class SettingsDialog(QDialog):
                 if max_record_time < 1.0 or max_record_time > 300.0:
                     QMessageBox.warning(self, "警告", "最大录音时间应在1-300秒之间")
                     return
+                
+                if preroll_time < 0.0 or preroll_time > 1.0:
+                    QMessageBox.warning(self, "警告", "预录时长应在0-1秒之间")
+                    return
+                
+                if vad_max_pause < 0.0 or vad_max_pause > 10.0:
+                    QMessageBox.warning(self, "警告", "停顿压缩上限应在0-10秒之间")
+                    return
                     
                 self.config.config["audio_settings"]["trigger_press_time"] = trigger_press_time
                 self.config.config["audio_settings"]["min_press_time"] = min_press_time
                 self.config.config["audio_settings"]["max_record_time"] = max_record_time
+                self.config.config["audio_settings"]["preroll_time"] = preroll_time
+                self.config.config["audio_settings"]["persistent_stream"] = self.persistent_stream.isChecked()
+                self.config.config["audio_settings"]["vad_enabled"] = self.vad_enabled.isChecked()
+                self.config.config["audio_settings"]["vad_max_pause"] = vad_max_pause
                 
             except ValueError:
                 QMessageBox.warning(self, "警告", "请输入有效的数字")
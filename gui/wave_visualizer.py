@@ -5,10 +5,11 @@ from PyQt6.QtGui import QPainter, QColor, QLinearGradient, QPen  # 添加 QPen 
 import numpy as np
 
 class WaveVisualizerWindow(QWidget):
-    def __init__(self, config_manager):
+    def __init__(self, config_manager, level_queue=None):
         super().__init__()
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)  # 添加这行
         self.config = config_manager
+        self.level_queue = level_queue
         self.dragging = False
         self.drag_position = None
         
@@ -31,9 +32,9 @@ class WaveVisualizerWindow(QWidget):
         # 设置窗口位置
         self.update_position()
         
-        # 更新定时器
+        # 更新定时器：每帧读取电平队列后重绘
         self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.update)
+        self.update_timer.timeout.connect(self.refresh_frame)
         self.update_timer.start(50)  # 20fps
         
         # 样式设置
@@ -65,8 +66,16 @@ class WaveVisualizerWindow(QWidget):
         """重置波形数据"""
         self.wave_data = np.zeros(50)
         self.max_amplitude = 0.1
+        if self.level_queue:
+            self.level_queue.drain()  # 丢弃上次录音残留的电平
         self.update()  # 立即更新显示
         
+    def refresh_frame(self):
+        """读取电平队列中的新数据并重绘"""
+        if self.level_queue and self.isVisible():
+            self.update_levels(self.level_queue.drain())
+        self.update()
+        
     def showEvent(self, event):
         """窗口显示时播放涟漪动画"""
         super().showEvent(event)
@@ -106,18 +115,18 @@ class WaveVisualizerWindow(QWidget):
         self.size_anim.start()
         self.opacity_anim.start()
     
-    def update_wave_data(self, data):
-        """更新波形数据"""
-        if len(data) > 0:
-            # 计算音频块的RMS值
-            rms = np.sqrt(np.mean(np.square(data)))
+    def update_levels(self, levels):
+        """用音频线程计算好的RMS电平更新波形数据"""
+        if len(levels) == 0:
+            return
+        normalized = np.empty(len(levels))
+        for i, rms in enumerate(levels):
             # 更新最大振幅添加衰减以使显示更动）
             self.max_amplitude = max(rms, self.max_amplitude * 0.95)
-            # 归一化并添加到波形数据
-            normalized = rms / (self.max_amplitude if self.max_amplitude > 0.1 else 0.1)
-            normalized = min(normalized, 1.0)  # 限制最大值
-            self.wave_data = np.roll(self.wave_data, -1)
-            self.wave_data[-1] = normalized
+            # 归一化并限制最大值
+            normalized[i] = min(rms / (self.max_amplitude if self.max_amplitude > 0.1 else 0.1), 1.0)
+        # 一次性左移并追加新数据
+        self.wave_data = np.concatenate((self.wave_data, normalized))[-len(self.wave_data):]
         
     def paintEvent(self, event):
         painter = QPainter(self)
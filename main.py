@@ -56,6 +56,7 @@ def main():
             
             window = MainWindow(config)
             keyboard_listener = KeyboardListener(window)
+            window.keyboard_listener = keyboard_listener  # 设置更新时需要通知键盘监听器
             
             window.show()
             ret = app.exec()
@@ -0,0 +1,106 @@
+"""测试公共设置：非Windows环境下替换Windows专用模块，提供本地桩服务器"""
+import os
+import sys
+import threading
+import time
+import types
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _stub_module(name, **attributes):
+    """模块无法导入时（非Windows或没有图形界面）用空实现代替"""
+    try:
+        __import__(name)
+        return
+    except Exception:
+        pass
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+
+def _unavailable(*args, **kwargs):
+    raise Exception("测试环境中不可用")
+
+_stub_module("pythoncom", CoInitialize=lambda: None)
+_stub_module("win32com")
+_stub_module("win32com.client", Dispatch=_unavailable)
+_stub_module("win32gui", GetForegroundWindow=lambda: 0)
+_stub_module("pyperclip", copy=lambda text: None, paste=lambda: "")
+_stub_module("pyautogui", PAUSE=0, FAILSAFE=True, write=_unavailable, hotkey=_unavailable, press=_unavailable)
+
+class StubServer:
+    """在后台线程运行的HTTP桩服务器
+
+    respond(path, headers, body)返回(状态码, Content-Type, 数据块列表)，
+    数据块以分块传输编码逐个发送，块之间间隔chunk_delay秒，用于模拟流式响应。
+    """
+
+    def __init__(self, respond, chunk_delay=0.0):
+        self.respond = respond
+        self.chunk_delay = chunk_delay
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server.requests.append((self.path, body))
+                status, content_type, chunks = server.respond(self.path, self.headers, body)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                    self.wfile.flush()
+                    time.sleep(server.chunk_delay)
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+@pytest.fixture
+def stub_server():
+    """stub_server(respond, chunk_delay=0.0)启动桩服务器，测试结束后关闭"""
+    servers = []
+
+    def start(respond, chunk_delay=0.0):
+        server = StubServer(respond, chunk_delay)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """在临时目录中使用默认配置，避免读写仓库中的config.json"""
+    monkeypatch.chdir(tmp_path)
+    from core.config_manager import ConfigManager
+    config_manager = ConfigManager()
+    config_manager.config["general_settings"]["prewarm_connections"] = False
+    config_manager.config["cache_settings"]["enabled"] = False
+    return config_manager
+
+@pytest.fixture
+def manager(config):
+    from core.transcription_manager import TranscriptionManager
+    transcription_manager = TranscriptionManager(config)
+    yield transcription_manager
+    transcription_manager.close()
@@ -0,0 +1,41 @@
+"""auto模式的提供商选择：先测量没有近期样本的提供商，再按预估耗时选择"""
+import time
+import pytest
+from core.latency_tracker import LatencyTracker
+
+@pytest.fixture
+def auto(manager, config):
+    for provider in ("openai", "groq"):
+        config.config["api_settings"]["transcription"][provider].update(api_key="test-key", api_url="http://127.0.0.1:9")
+    config.config["transcription_settings"]["provider"] = "auto"
+    return manager
+
+def _record(manager, provider, latency, audio_seconds):
+    manager.latency.record(manager._latency_key(provider), latency, audio_seconds)
+
+def test_unmeasured_provider_is_tried(auto):
+    _record(auto, "openai", 9.0, 3.0)
+    assert auto.choose_provider(3.0) == "groq"
+    # 每个提供商每probe_interval只分配一次测量，之后按预估选择
+    assert auto.choose_provider(3.0) == "openai"
+    _record(auto, "groq", 1.0, 3.0)
+    assert auto.choose_provider(3.0) == "groq"
+
+def test_stale_provider_is_remeasured(auto, config):
+    config.config["transcription_settings"]["probe_interval"] = 0.05
+    _record(auto, "openai", 9.0, 3.0)
+    _record(auto, "groq", 1.0, 3.0)
+    assert auto.choose_provider(3.0) == "groq"
+    time.sleep(0.06)
+    _record(auto, "groq", 1.0, 3.0)
+    assert auto.choose_provider(3.0) == "openai"
+    assert auto.choose_provider(3.0) == "groq"
+
+def test_old_samples_decay():
+    tracker = LatencyTracker()
+    tracker.HALF_LIFE = 0.01
+    tracker.record("slow", 9.0, 3.0)
+    time.sleep(0.1)
+    tracker.record("slow", 1.0, 3.0)
+    # 旧样本几乎不再影响平均值
+    assert tracker.estimate("slow", 3.0) == pytest.approx(1.0, rel=0.01)
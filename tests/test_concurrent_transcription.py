@@ -0,0 +1,49 @@
+"""并发转写回归测试：多个请求同时经过复用的会话/客户端，结果不能串，也不能落地临时文件"""
+import glob
+import json
+import random
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from core.wav_utils import pcm_to_wav
+
+PROVIDERS = ("openai", "groq", "custom")
+
+def _clip(number):
+    """每段录音的样本值不同，桩服务器据此识别是哪段音频"""
+    return pcm_to_wav(np.full(1600, number, dtype=np.int16), 16000, 1)
+
+def _respond(path, headers, body):
+    # 从multipart请求体中找到WAV的data块，读出第一个样本
+    data = body.index(b"data", body.index(b"WAVE"))
+    number = struct.unpack("<h", body[data + 8:data + 10])[0]
+    time.sleep(random.uniform(0, 0.05))  # 打乱完成顺序
+    text = json.dumps({"text": f"{path.strip('/').split('/')[0]}:{number}"})
+    return 200, "application/json", [text.encode()]
+
+@pytest.fixture
+def configured(config, stub_server):
+    server = stub_server(_respond)
+    for provider in PROVIDERS:
+        settings = config.config["api_settings"]["transcription"][provider]
+        settings["api_key"] = "test-key"
+        settings["audio_format"] = "wav"
+        settings["api_url"] = f"{server.url}/{provider}"
+    return server
+
+def test_concurrent_requests_keep_their_own_results(manager, configured):
+    jobs = [(provider, number) for number in range(1, 7) for provider in PROVIDERS]
+
+    def transcribe(job):
+        provider, number = job
+        audio_file = manager.encode_audio(_clip(number), provider)
+        return manager.request_transcription(audio_file, provider, 0.1)
+
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        results = list(pool.map(transcribe, jobs))
+
+    assert results == [f"{provider}:{number}" for provider, number in jobs]
+    assert len(configured.requests) == len(jobs)
+    assert not glob.glob("temp_audio.*")
@@ -0,0 +1,70 @@
+"""按住录音热键时不插入文本：模拟输入会变成Ctrl快捷键"""
+import threading
+import time
+import types
+import pytest
+from core.transcription_worker import TranscriptionExecutor
+
+@pytest.fixture
+def executor(config):
+    inserted = []
+    manager = types.SimpleNamespace(
+        cache=types.SimpleNamespace(key=lambda audio: None, get=lambda key: None, put=lambda key, text: None),
+        record_history=lambda *args: None,
+        insert_text=lambda text, settle=True: inserted.append(("insert", text)),
+        replace_inserted=lambda old, new: inserted.append(("replace", old, new)),
+        foreground_window=lambda: 1,
+        prepare_post_process=lambda text: (text, True),
+        post_process=lambda text: text + "！",
+        streaming_post_process_enabled=lambda: False,
+        optimistic_post_process_enabled=lambda: False,
+    )
+    executor = TranscriptionExecutor(manager, config)
+    executor._transcribe = lambda job: "你好"
+    released = threading.Event()
+    executor.set_hotkey_state(released)
+    yield executor, manager, released, inserted
+    executor.shutdown()
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_insert_waits_for_hotkey_release(executor):
+    executor, _, released, inserted = executor
+    executor.submit(b"audio")
+    time.sleep(0.3)
+    assert inserted == []
+    released.set()
+    assert _wait_for(lambda: inserted == [("insert", "你好！")])
+
+def test_optimistic_correction_waits_for_hotkey_release(executor):
+    executor, manager, released, inserted = executor
+    manager.optimistic_post_process_enabled = lambda: True
+    released.set()
+    post_process_started = threading.Event()
+
+    def post_process(text):
+        # 后处理期间用户又按下了热键
+        released.clear()
+        post_process_started.set()
+        return text + "！"
+
+    manager.post_process = post_process
+    executor.submit(b"audio")
+    assert post_process_started.wait(2.0)
+    time.sleep(0.3)
+    assert inserted == [("insert", "你好")]
+    released.set()
+    assert _wait_for(lambda: inserted == [("insert", "你好"), ("replace", "你好", "你好！")])
+
+def test_cancel_while_waiting_discards_text(executor):
+    executor, _, released, inserted = executor
+    job_id = executor.submit(b"audio")
+    time.sleep(0.2)
+    executor.cancel(job_id)
+    released.set()
+    time.sleep(0.3)
+    assert inserted == []
@@ -0,0 +1,41 @@
+"""多密钥限流：某个密钥被服务端限流(429)时换用其他密钥，不计入重试次数和熔断"""
+import json
+import pytest
+
+AUDIO_FILE = ("audio.wav", b"RIFF-test-audio", "audio/wav")
+KEYS = ["k1", "k2", "k3", "k4", "k5"]
+
+@pytest.fixture
+def groq(config):
+    settings = config.config["api_settings"]["transcription"]["groq"]
+    settings["api_key"] = KEYS[0]
+    settings["api_keys"] = KEYS[1:]
+    config.config["general_settings"]["max_retries"] = 0
+    return settings
+
+def _serve(stub_server, groq, allowed):
+    used = []
+
+    def respond(path, headers, body):
+        key = headers["Authorization"].split()[-1]
+        used.append(key)
+        if key in allowed:
+            return 200, "application/json", [json.dumps({"text": key}).encode()]
+        return 429, "application/json", [b'{"error": "rate limited"}']
+
+    groq["api_url"] = stub_server(respond).url
+    return used
+
+def test_rotates_through_every_key_on_429(manager, stub_server, groq):
+    used = _serve(stub_server, groq, allowed={"k5"})
+    assert manager.request_transcription(AUDIO_FILE, "groq", 1.0) == "k5"
+    assert used == KEYS
+    assert manager.resilience.breaker("groq").failures == 0
+
+def test_all_keys_limited_counts_one_failure(manager, stub_server, groq):
+    used = _serve(stub_server, groq, allowed=set())
+    with pytest.raises(Exception, match="429"):
+        manager.request_transcription(AUDIO_FILE, "groq", 1.0)
+    assert used == KEYS
+    assert manager.resilience.breaker("groq").failures == 1
+    assert manager.resilience.is_available("groq")
@@ -0,0 +1,95 @@
+"""流式后处理：SSE解析、Groq流式响应和增量插入"""
+import json
+import pytest
+from core.http_client import HttpClientPool
+from core.incremental_inserter import IncrementalInserter
+from core.resilience import ResilienceLayer
+from core.sse import iter_lines, iter_sse_data
+from core.text_processor import TextProcessor
+
+def _event(content):
+    payload = {"choices": [{"delta": {"content": content}}]}
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+def test_iter_lines_joins_chunks_and_strips_crlf():
+    chunks = [b"first\r", b"\nsec", b"ond\r\nla", "中".encode()[:2], "中".encode()[2:] + b"st"]
+    assert list(iter_lines(chunks)) == ["first", "second", "la中st"]
+
+def test_iter_sse_data_multiline_comments_and_crlf():
+    stream = (
+        b": heartbeat\r\n\r\n"
+        b"data: first line\r\ndata: second line\r\n\r\n"
+        b"event: message\ndata:no space\n\n"
+        b"data: [DONE]"
+    )
+    chunks = [stream[i:i + 7] for i in range(0, len(stream), 7)]
+    assert list(iter_sse_data(chunks)) == ["first line\nsecond line", "no space", "[DONE]"]
+
+def test_inserter_flushes_at_boundaries():
+    inserted = []
+    inserter = IncrementalInserter(lambda text, settle: inserted.append((text, settle)))
+    for delta in ["  今天", "天气很好，", "我们", "去公园。 Hel", "lo wor", "ld"]:
+        inserter.feed(delta)
+    assert inserter.finish() == "今天天气很好，我们去公园。 Hello world"
+    assert inserted == [
+        ("今天天气很好，", True),
+        ("我们去公园。 ", False),
+        ("Hello ", False),
+        ("world", False),
+    ]
+
+def test_inserter_flushes_long_text_without_boundaries():
+    inserted = []
+    inserter = IncrementalInserter(lambda text, settle: inserted.append(text))
+    inserter.feed("这是一段没有任何标点符号的很长的文本")
+    assert inserted == ["这是一段没有任何标点符号的很长的文本"]
+
+def test_inserter_skips_whitespace_only_batches():
+    inserted = []
+    inserter = IncrementalInserter(lambda text, settle: inserted.append(text))
+    for delta in ["你好，", " ", "\n", "世界"]:
+        inserter.feed(delta)
+    inserter.finish()
+    assert inserted == ["你好，", " \n世界"]
+
+@pytest.fixture
+def groq_processor(config, stub_server):
+    def respond(path, headers, body):
+        request = json.loads(body)
+        assert path == "/groq/chat/completions"
+        assert request["stream"] is True
+        chunks = [b": keep-alive\n\n"] + [_event(piece) for piece in ["修正后", "的文本，", "完成。"]]
+        # [DONE]之后的内容必须被忽略
+        chunks += [b"data: [DONE]\n\n", _event("多余")]
+        return 200, "text/event-stream", chunks
+
+    server = stub_server(respond, chunk_delay=0.01)
+    config.config["api_settings"]["transcription"]["groq"].update(api_key="test-key", api_url=f"{server.url}/groq")
+    config.config["transcription_settings"]["post_process_provider"] = "groq"
+    http_pool = HttpClientPool(config)
+    yield TextProcessor(config, http_pool, ResilienceLayer(config)), server
+    http_pool.close()
+
+def test_groq_stream_yields_deltas_until_done(groq_processor):
+    processor, server = groq_processor
+    assert list(processor.process_stream("原始文本")) == ["修正后", "的文本，", "完成。"]
+    # 完整结果写入缓存，再次请求不访问服务
+    assert list(processor.process_stream("原始文本")) == ["修正后的文本，完成。"]
+    assert len(server.requests) == 1
+
+def test_groq_stream_into_inserter(groq_processor):
+    processor, _ = groq_processor
+    inserted = []
+    inserter = IncrementalInserter(lambda text, settle: inserted.append(text))
+    for delta in processor.process_stream("另一段文本"):
+        inserter.feed(delta)
+    assert inserter.finish() == "修正后的文本，完成。"
+    assert inserted == ["修正后的文本，", "完成。"]
+
+def test_groq_stream_error_status(config, stub_server):
+    server = stub_server(lambda path, headers, body: (401, "application/json", [b'{"error": "bad key"}']))
+    config.config["api_settings"]["transcription"]["groq"].update(api_key="test-key", api_url=server.url)
+    config.config["transcription_settings"]["post_process_provider"] = "groq"
+    processor = TextProcessor(config, HttpClientPool(config), ResilienceLayer(config))
+    with pytest.raises(Exception, match="401"):
+        list(processor.process_stream("文本"))
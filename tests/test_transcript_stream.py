@@ -0,0 +1,107 @@
+"""流式转写：事件解析、稳定文本和本地桩服务器回放的SSE/JSON行/普通JSON响应"""
+import json
+import pytest
+from core.transcript_stream import TranscriptStabilizer, parse_transcript_event
+
+AUDIO_FILE = ("audio.wav", b"RIFF-test-audio", "audio/wav")
+TIMEOUT = (5.0, 10.0)
+
+def test_parse_transcript_event():
+    assert parse_transcript_event('{"type": "transcript.text.delta", "delta": "你好"}') == ("delta", "你好")
+    assert parse_transcript_event('{"type": "transcript.text.done", "text": "你好世界"}') == ("final", "你好世界")
+    assert parse_transcript_event('{"text": "你", "is_final": false}') == ("partial", "你")
+    assert parse_transcript_event('{"type": "partial", "text": "你好"}') == ("partial", "你好")
+    assert parse_transcript_event('{"text": "一段", "is_final": true}') == ("segment", "一段")
+    assert parse_transcript_event('{"id": 0, "start": 0.0, "text": "一段"}') == ("segment", "一段")
+    assert parse_transcript_event('{"type": "usage", "seconds": 3}') is None
+    assert parse_transcript_event('[1, 2]') is None
+    with pytest.raises(Exception, match="quota"):
+        parse_transcript_event('{"error": {"message": "quota"}}')
+
+def test_stabilizer_deltas_and_done():
+    stabilizer = TranscriptStabilizer()
+    assert stabilizer.update("delta", "今天") == "今天"
+    assert stabilizer.update("delta", "天气") == "天气"
+    assert stabilizer.update("final", "今天天气很好") == "很好"
+    assert stabilizer.text == "今天天气很好"
+
+def test_stabilizer_partials_need_agreement():
+    stabilizer = TranscriptStabilizer()
+    assert stabilizer.update("partial", "今天") == ""
+    assert stabilizer.update("partial", "今天天气") == "今天"
+    assert stabilizer.update("partial", "今天天气很") == "天气"
+    assert stabilizer.update("segment", "今天天气很好。") == "很好。"
+    assert stabilizer.update("partial", "我们") == ""
+    assert stabilizer.text == "今天天气很好。我们"
+
+def test_stabilizer_partial_that_changes():
+    stabilizer = TranscriptStabilizer()
+    stabilizer.update("partial", "今天天起")
+    assert stabilizer.update("partial", "今天天起来") == "今天天起"
+    # 已产出的文本被修改后不再产出增量，由最终结果修正
+    assert stabilizer.update("partial", "今天天气很好") == ""
+    assert stabilizer.update("segment", "今天天气很好。") == ""
+    assert stabilizer.emitted == "今天天起"
+    assert stabilizer.text == "今天天气很好。"
+
+SSE_EVENTS = [
+    {"type": "transcript.text.delta", "delta": "今天天气"},
+    {"type": "transcript.text.delta", "delta": "很好。"},
+    {"type": "transcript.text.done", "text": "今天天气很好。"},
+]
+JSON_LINES = [
+    {"text": "第一句", "is_final": False},
+    {"text": "第一句话，"},
+    {"text": "第二句。"},
+]
+
+def _respond(path, headers, body):
+    assert b'name="stream"' in body and b"RIFF-test-audio" in body
+    if path.endswith("/sse/audio/transcriptions"):
+        chunks = [b": ping\n\n"]
+        chunks += [f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n".encode() for event in SSE_EVENTS]
+        return 200, "text/event-stream", chunks + [b"data: [DONE]\n\n"]
+    if path.endswith("/jsonl"):
+        lines = [json.dumps(event, ensure_ascii=False).encode() + b"\n" for event in JSON_LINES]
+        return 200, "application/x-ndjson", [b"\n"] + lines
+    if path.endswith("/plain"):
+        return 200, "application/json", [json.dumps({"text": "完整结果"}).encode()]
+    return 500, "application/json", [b'{"error": "unexpected"}']
+
+@pytest.fixture
+def server(config, stub_server):
+    server = stub_server(_respond, chunk_delay=0.01)
+    for provider in ("openai", "custom"):
+        config.config["api_settings"]["transcription"][provider].update(api_key="test-key", stream_response=True)
+    return server
+
+def _set_url(config, provider, url):
+    config.config["api_settings"]["transcription"][provider]["api_url"] = url
+
+def test_sse_stream(manager, config, server):
+    _set_url(config, "openai", f"{server.url}/sse")
+    events = manager._open_transcript_stream("openai", AUDIO_FILE, TIMEOUT, "test-key")
+    assert list(events) == [("delta", "今天天气"), ("delta", "很好。"), ("final", "今天天气很好。")]
+    assert server.requests[0][0] == "/sse/audio/transcriptions"
+
+def test_json_lines_stream(manager, config, server):
+    _set_url(config, "custom", f"{server.url}/jsonl")
+    events = manager._open_transcript_stream("custom", AUDIO_FILE, TIMEOUT, "test-key")
+    assert list(events) == [("partial", "第一句"), ("segment", "第一句话，"), ("segment", "第二句。")]
+
+def test_plain_json_response(manager, config, server):
+    _set_url(config, "custom", f"{server.url}/plain")
+    events = manager._open_transcript_stream("custom", AUDIO_FILE, TIMEOUT, "test-key")
+    assert list(events) == [("final", "完整结果")]
+
+def test_request_transcription_collects_stream(manager, config, server):
+    _set_url(config, "openai", f"{server.url}/sse")
+    _set_url(config, "custom", f"{server.url}/jsonl")
+    assert manager.request_transcription(AUDIO_FILE, "openai", 1.0) == "今天天气很好。"
+    assert manager.request_transcription(AUDIO_FILE, "custom", 1.0) == "第一句话，第二句。"
+
+def test_closing_stream_early(manager, config, server):
+    _set_url(config, "custom", f"{server.url}/jsonl")
+    events = manager._open_transcript_stream("custom", AUDIO_FILE, TIMEOUT, "test-key")
+    assert next(events) == ("partial", "第一句")
+    events.close()